@@ -0,0 +1,184 @@
+"""
+Benchmarks the parse and visualization pipeline on a synthetic trace (see gen_trace), so no
+gem5 build is needed.
+
+Times parseData, create_heat_maps, heat_map_window, heat_map_window_all, create_colormap,
+top_n_windows and draw_mesh, and records the peak memory allocated by each. Each stage is timed over
+several repeats without memory tracing, then run once more under tracemalloc for its peak.
+Results are written as JSON and compared against a stored baseline; a stage slower than
+the baseline by more than the tolerance is reported as a regression.
+
+usage:
+python benchmarks/bench_pipeline.py [--rows 8] [--cycles 2000] [--rate 0.1] [--pattern uniform_random]
+                                    [--output results.json] [--baseline benchmarks/baseline.json]
+                                    [--save-baseline] [--tolerance 0.25] [--min-delta 0.001]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench_dir))
+
+from gen_trace import generate, patterns, bit_patterns
+from parse_data import parseData
+from hotspot_functions import create_heat_maps, heat_map_window, heat_map_window_all, create_colormap, \
+    top_n_windows, most_active_at
+from hotspot_visualizer_mesh import draw_mesh
+
+default_baseline = os.path.join(bench_dir, "baseline.json")
+
+def measure(func, repeat):
+    """
+    Times func and measures its peak allocated memory.
+
+    Outputs:
+        (dict of timing and memory results, return value of func)
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ret = func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"best_s": min(times), "mean_s": sum(times) / len(times), "peak_bytes": peak}, ret
+
+def run(trace, repeat, window_size, window_offset):
+    """ Runs every pipeline stage on trace, returns {stage name: results}. """
+
+    results = {}
+
+    results["parseData"], (cycle_data, _, _, net_topology) = measure(
+        lambda: parseData(trace, "MESH"), max(1, repeat // 5))
+
+    results["create_heat_maps"], (router_counts, heat_map_ports) = measure(
+        lambda: create_heat_maps(cycle_data, net_topology), max(1, repeat // 5))
+
+    # normalized as in the visualizers
+    heat_map_routers = router_counts / net_topology.max_ports
+    sim_cycles = heat_map_routers.shape[0]
+    window_size = min(window_size, sim_cycles)
+    window_offset = min(window_offset, sim_cycles - window_size)
+
+    results["heat_map_window"], router_window = measure(
+        lambda: heat_map_window(heat_map_routers, window_size, window_offset, 0), repeat)
+
+    results["heat_map_window_all"], _ = measure(
+        lambda: heat_map_window_all(heat_map_routers, 100), repeat)
+
+    results["create_colormap"], _ = measure(
+        lambda: create_colormap(heat_map_routers, 100), repeat)
+
+    results["top_n_windows"], (ranking, _) = measure(
+        lambda: top_n_windows(router_counts, 100, 4, scale=1/net_topology.max_ports), repeat)
+    most_active = most_active_at(ranking, window_offset, 4)
+
+    results["draw_mesh"], _ = measure(
+        lambda: draw_mesh(router_window, net_topology, most_active, 0), repeat)
+
+    port_window = heat_map_window(heat_map_ports, window_size, window_offset, 0)
+    results["draw_mesh_ports"], _ = measure(
+        lambda: draw_mesh(port_window, net_topology, most_active, 1), repeat)
+
+    return results
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    Prints the results next to the baseline.
+
+    Outputs:
+        list of stages slower than baseline by more than tolerance and by more than
+        min_delta seconds, so timer noise on the sub-millisecond stages is not flagged
+    """
+
+    regressions = []
+    print("%-22s %10s %10s %8s %12s" % ("stage", "best [s]", "base [s]", "ratio", "peak [MB]"))
+    for stage, res in results.items():
+        base = baseline.get(stage) if baseline else None
+        if base:
+            ratio = res["best_s"] / base["best_s"]
+            if ratio > 1 + tolerance and res["best_s"] - base["best_s"] > min_delta:
+                regressions.append(stage)
+            print("%-22s %10.4f %10.4f %8.2f %12.1f%s" % (stage, res["best_s"], base["best_s"], ratio,
+                  res["peak_bytes"] / 2**20, "  REGRESSION" if stage in regressions else ""))
+        else:
+            print("%-22s %10.4f %10s %8s %12.1f" % (stage, res["best_s"], "-", "-", res["peak_bytes"] / 2**20))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="benchmark the trace parse and visualization pipeline")
+    parser.add_argument("--rows", type=int, default=8, help="mesh is rows x rows routers")
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=0.1, help="packets per cycle per router")
+    parser.add_argument("--pattern", choices=patterns, default='uniform_random')
+    parser.add_argument("--repeat", type=int, default=10, help="timed repeats of the fast stages")
+    parser.add_argument("--window-size", type=int, default=500)
+    parser.add_argument("--window-offset", type=int, default=500)
+    parser.add_argument("--output", default="bench_results.json", help="results JSON")
+    parser.add_argument("--baseline", default=default_baseline, help="baseline results JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--min-delta", type=float, default=0.001,
+                        help="slowdowns smaller than this many seconds are not regressions")
+    args = parser.parse_args(argv)
+    if args.pattern in bit_patterns and (args.rows * args.rows) & (args.rows * args.rows - 1):
+        parser.error("%s traffic needs a power of two routers, --rows should be a power of two" % args.pattern)
+
+    config = {"rows": args.rows, "cycles": args.cycles, "rate": args.rate, "pattern": args.pattern,
+              "window_size": args.window_size, "window_offset": args.window_offset}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trace = os.path.join(tmp_dir, "LoupeTraceFile.csv")
+        num_rows = generate(trace, args.rows, args.cycles, args.rate, args.pattern)
+        print("synthetic trace: %d rows, %d bytes" % (num_rows, os.path.getsize(trace)))
+        results = run(trace, args.repeat, args.window_size, args.window_offset)
+
+    output = {
+        "config": config,
+        "trace_rows": num_rows,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "machine": platform.machine(), "processor": platform.processor()},
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=1)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored["config"] == config:
+            baseline = stored["results"]
+        else:
+            print("baseline %s was recorded with a different config, not comparing" % args.baseline)
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(output, f, indent=1)
+        print("saved baseline to %s" % args.baseline)
+        return 0
+
+    if regressions:
+        print("regressions: " + ", ".join(regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,191 @@
+"""
+Generates synthetic LoupeTraceFile.csv traces without gem5.
+
+Traffic is injected at every router of an NxN mesh with the given injection rate and
+traffic pattern, and routed XY with a fixed per hop latency (no contention is modeled).
+The output has the same layout as a Garnet trace: the header with the GarnetNetwork::print
+line and the Ports line of every router, InUnit rows for every flit arriving at a router,
+Link rows for body/tail flits crossing router to router links, and the "End of sim"
+trailer, so it can be fed to parse_data and the visualizers.
+
+usage:
+python gen_trace.py outFile [--rows 8] [--cycles 10000] [--rate 0.1] [--pattern uniform_random]
+"""
+
+import argparse
+import numpy as np
+
+patterns = ['uniform_random', 'transpose', 'bit_complement', 'bit_reverse', 'tornado',
+            'neighbor', 'shuffle', 'hotspot']
+
+# patterns operating on the bits of the router id, which need a power of two routers
+bit_patterns = ['bit_complement', 'bit_reverse', 'shuffle']
+
+# flit_type enum in garnet2.0/CommonTypes.hh
+HEAD, BODY, TAIL, HEAD_TAIL = 0, 1, 2, 3
+
+router_latency = 1 # cycles spent in a router before the flit goes on a link
+link_latency = 1
+
+def destination(pattern, src, rows, rng):
+    """ Destination router of a packet injected at src, following garnet's synthetic traffic patterns. """
+
+    num_routers = rows * rows
+    bits = max(num_routers.bit_length() - 1, 1)
+    x, y = src % rows, src // rows
+
+    if pattern == 'uniform_random':
+        return int(rng.integers(num_routers))
+    if pattern == 'transpose':
+        return x * rows + y
+    if pattern == 'bit_complement':
+        return (~src) & (num_routers - 1)
+    if pattern == 'bit_reverse':
+        return int(format(src, '0%db' % bits)[::-1], 2)
+    if pattern == 'tornado':
+        return y * rows + (x + rows // 2 - 1) % rows
+    if pattern == 'neighbor':
+        return y * rows + (x + 1) % rows
+    if pattern == 'shuffle':
+        return ((src << 1) | (src >> (bits - 1))) & (num_routers - 1)
+    if pattern == 'hotspot':
+        # a quarter of the traffic goes to the center router
+        if rng.random() < 0.25:
+            return (rows // 2) * rows + rows // 2
+        return int(rng.integers(num_routers))
+    raise ValueError("unknown traffic pattern " + pattern)
+
+def xy_route(src, dst, rows):
+    """
+    XY route from src to dst.
+
+    Outputs:
+        list of (router, inport direction) for every router the packet arrives at, starting
+        with the source router's Local port
+    """
+
+    x, y = src % rows, src // rows
+    dx, dy = dst % rows, dst // rows
+    hops = [(src, "Local")]
+    while x != dx:
+        step = 1 if dx > x else -1
+        x += step
+        hops.append((y * rows + x, "West" if step == 1 else "East"))
+    while y != dy:
+        step = 1 if dy > y else -1
+        y += step
+        hops.append((y * rows + x, "South" if step == 1 else "North"))
+    return hops
+
+def link_ids(rows):
+    """ Ids of the router to router links, keyed by (src, dst) router. """
+
+    ids = {}
+    link_id = 2 * rows * rows # garnet numbers the external links first
+    for r in range(rows * rows):
+        x, y = r % rows, r // rows
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < rows and 0 <= ny < rows:
+                ids[(r, ny * rows + nx)] = link_id
+                link_id += 1
+    return ids
+
+def router_ports(rows):
+    """
+    Router to router input ports of each router as (input unit index, direction, upstream router),
+    as in the Ports lines Garnet prints. Input unit 0 is the Local port, as garnet adds the
+    external links first.
+    """
+
+    ports = []
+    for r in range(rows * rows):
+        x, y = r % rows, r // rows
+        router_ports = []
+        for direction, nx, ny in (("West", x - 1, y), ("East", x + 1, y), ("South", x, y - 1), ("North", x, y + 1)):
+            if 0 <= nx < rows and 0 <= ny < rows:
+                router_ports.append((len(router_ports) + 1, direction, ny * rows + nx))
+        ports.append(router_ports)
+    return ports
+
+def generate(filename, rows=8, cycles=10000, rate=0.1, pattern='uniform_random',
+             vcs_per_vnet=4, vnets=3, seed=0):
+    """
+    Writes a synthetic trace.
+
+    Inputs:
+        filename - output .csv path
+        rows - mesh is rows x rows routers
+        cycles - simulated cycles
+        rate - injection rate in packets per cycle per router
+        pattern - traffic pattern, one of patterns. bit_patterns need rows*rows to be a power of two
+        vcs_per_vnet, vnets - written to the header; vnet 2 packets are 5 flits, others 1
+        seed - random seed, the same arguments always give the same trace
+    Outputs:
+        number of trace rows written
+    """
+
+    num_routers = rows * rows
+    if pattern in bit_patterns and num_routers & (num_routers - 1):
+        raise ValueError("%s traffic needs a power of two routers, not %d" % (pattern, num_routers))
+
+    rng = np.random.default_rng(seed)
+    links = link_ids(rows)
+    ports = router_ports(rows)
+    inport_ids = {(r, direction): port for r, inports in enumerate(ports) for port, direction, _ in inports}
+    hop_latency = router_latency + link_latency
+    events = [[] for _ in range(cycles + 1)]
+
+    for cycle in range(1, cycles + 1):
+        for src in np.nonzero(rng.random(num_routers) < rate)[0]:
+            src = int(src)
+            dst = destination(pattern, src, rows, rng)
+            vnet = int(rng.integers(vnets))
+            vc = vnet * vcs_per_vnet + int(rng.integers(vcs_per_vnet))
+            size = 5 if vnet == 2 else 1
+            hops = xy_route(src, dst, rows)
+
+            for flit_id in range(size):
+                if size == 1:
+                    flit_type = HEAD_TAIL
+                else:
+                    flit_type = HEAD if flit_id == 0 else (TAIL if flit_id == size - 1 else BODY)
+                flit = "flit,%d,%d,%d,%d,%d,%d,%d" % (flit_id, flit_type, vnet, vc, src, dst, cycle)
+
+                for k, (router, direction) in enumerate(hops):
+                    arrival = cycle + 1 + flit_id + k * hop_latency
+                    if arrival > cycles:
+                        break
+                    events[arrival].append("%d,InUnit,%d,%s,%s,%d,%d,\n" % (arrival, router, direction, flit, k,
+                                                                            inport_ids.get((router, direction), 0)))
+                    # garnet only traces body and tail flits on links
+                    if flit_id != 0 and k + 1 < len(hops) and arrival + router_latency <= cycles:
+                        link = links[(router, hops[k + 1][0])]
+                        events[arrival + router_latency].append(
+                            "%d,Link,%d,-1,%s,-1,\n" % (arrival + router_latency, link, flit))
+
+    num_rows = 0
+    with open(filename, 'w') as f:
+        f.write("Mesh,%d,%d,%d,%d,%d,%d,\n" % (cycles, num_routers, rows, vcs_per_vnet, vnets,
+                                              max(len(p) for p in ports)))
+        for r, inports in enumerate(ports):
+            f.write("Ports,%d,%s\n" % (r, "".join("%d,%s,%d," % port for port in inports)))
+        for cycle_events in events:
+            f.writelines(cycle_events)
+            num_rows += len(cycle_events)
+        f.write("End of sim,\n")
+    return num_rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate a synthetic Loupe trace without gem5")
+    parser.add_argument("outFile")
+    parser.add_argument("--rows", type=int, default=8, help="mesh is rows x rows routers")
+    parser.add_argument("--cycles", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=0.1, help="packets per cycle per router")
+    parser.add_argument("--pattern", choices=patterns, default='uniform_random')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.pattern in bit_patterns and (args.rows * args.rows) & (args.rows * args.rows - 1):
+        parser.error("%s traffic needs a power of two routers, --rows should be a power of two" % args.pattern)
+
+    num_rows = generate(args.outFile, args.rows, args.cycles, args.rate, args.pattern, seed=args.seed)
+    print("wrote %d rows to %s" % (num_rows, args.outFile))
@@ -43,6 +43,7 @@ enum VC_state_type {IDLE_, VC_AB_, ACTIVE_, NUM_VC_STATE_TYPE_};
 enum VNET_type {CTRL_VNET_, DATA_VNET_, NULL_VNET_, NUM_VNET_TYPE_};
 enum flit_stage {I_, VA_, SA_, ST_, LT_, NUM_FLIT_STAGE_};
 enum link_type { EXT_IN_, EXT_OUT_, INT_, NUM_LINK_TYPES_ };
+enum trace_event_type { TRACE_INUNIT_, TRACE_LINK_, NUM_TRACE_EVENT_TYPES_ };
 enum RoutingAlgorithm { TABLE_ = 0, XY_ = 1, TURN_MODEL_OBLIVIOUS_ = 2,
                         TURN_MODEL_ADAPTIVE_ = 3, RANDOM_OBLIVIOUS_ = 4,
                         RANDOM_ADAPTIVE_ = 5, CUSTOM_ = 6,
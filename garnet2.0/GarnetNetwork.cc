@@ -33,6 +33,7 @@
 
 #include "mem/ruby/network/garnet2.0/GarnetNetwork.hh"
 
+#include <algorithm>
 #include <cassert>
 
 #include "base/cast.hh"
@@ -97,23 +98,12 @@ GarnetNetwork::GarnetNetwork(const Params *p)
         ni->init_net_ptr(this);
     }
 
-	hotspot_detect_on=0;
-	hotspot_period=-1;
-	hotspot_cutoff=-1;
-	std::string cmdline_topology;
-	int cmdline_sim_cycles=-1;
-	std::ifstream hotspot_cfg_file("hotspot_config.txt");
-
-	if(hotspot_cfg_file.is_open()){
-		hotspot_cfg_file >> hotspot_detect_on;
-		hotspot_cfg_file >> hotspot_cutoff;
-		hotspot_cfg_file >> hotspot_period;
-		hotspot_cfg_file >> cmdline_topology;
-		hotspot_cfg_file >> cmdline_sim_cycles;
-		
-	}
-	else std::cout<<"could not open hotspot_config.txt"<<std::endl;
-	hotspot_cfg_file.close();
+    m_router_inports.resize(m_routers.size());
+
+	hotspot_detect_on = p->hotspot_detect;
+	hotspot_cutoff = p->hotspot_cutoff;
+	hotspot_period = p->hotspot_period;
+	int cmdline_sim_cycles = p->hotspot_sim_cycles;
 
 	if(hotspot_cutoff==-1){
 		hotspot_cutoff = m_routers.size();
@@ -128,11 +118,47 @@ GarnetNetwork::GarnetNetwork(const Params *p)
 	next_hotspot_processing_cycle=hotspot_period;
 
 
-    loupeFile.open("LoupeTraceFile.csv", std::ofstream::out);
-    loupeFileptr = &loupeFile;
-	hotspotStatFile.open("hotspotStatFile.txt", std::ofstream::out);
+    m_trace_start_cycle = Cycles(p->trace_start_cycle);
+    m_trace_end_cycle = p->trace_end_cycle;
+    m_trace_routers = p->trace_routers;
+    m_trace_region = p->trace_region;
+    m_trace_event_on[TRACE_INUNIT_] = (p->trace_events == "all" ||
+                                       p->trace_events == "InUnit");
+    m_trace_event_on[TRACE_LINK_] = (p->trace_events == "all" ||
+                                     p->trace_events == "Link");
+    m_trace_sample = p->trace_sample;
+    m_trace_sample_count = 0;
+
+    if (!p->trace_vnets.empty()) {
+        m_trace_vnet_mask.resize(m_virtual_networks, false);
+        for (int vnet : p->trace_vnets) {
+            if (vnet >= 0 && vnet < m_virtual_networks)
+                m_trace_vnet_mask[vnet] = true;
+        }
+    }
 
-	loupeFile << cmdline_topology<<","<<cmdline_sim_cycles<<",";
+    loupeTraceBuf = NULL;
+    loupeTraceStream = NULL;
+    if (p->trace_compression > 0) {
+        // block compressed trace with an index of block offsets
+        std::string trace_file = p->loupe_trace_file;
+        if (trace_file.size() < 3 ||
+            trace_file.compare(trace_file.size() - 3, 3, ".gz") != 0)
+            trace_file += ".gz";
+        loupeFile.open(trace_file.c_str(),
+                       std::ofstream::out | std::ofstream::binary);
+        loupeTraceBuf = new LoupeTraceBuf(&loupeFile, trace_file + ".idx",
+                                          p->trace_compression,
+                                          p->trace_block_size);
+        loupeTraceStream = new std::ostream(loupeTraceBuf);
+        loupeFileptr = loupeTraceStream;
+    } else {
+        loupeFile.open(p->loupe_trace_file.c_str(), std::ofstream::out);
+        loupeFileptr = &loupeFile;
+    }
+	hotspotStatFile.open(p->hotspot_stat_file.c_str(), std::ofstream::out);
+
+	*loupeFileptr << p->hotspot_topology<<","<<cmdline_sim_cycles<<",";
 
 }
 
@@ -163,6 +189,28 @@ GarnetNetwork::init()
         m_num_cols = -1;
     }
 
+    // Loupe trace router filter: listed router ids plus any router inside
+    // the rectangular mesh region
+    if (!m_trace_routers.empty() || !m_trace_region.empty()) {
+        m_trace_router_mask.resize(m_routers.size(), false);
+        for (int router_id : m_trace_routers) {
+            if (router_id >= 0 && router_id < m_routers.size())
+                m_trace_router_mask[router_id] = true;
+        }
+        if (m_trace_region.size() == 4 && m_num_cols > 0) {
+            for (int i = 0; i < m_routers.size(); i++) {
+                int x = i % m_num_cols;
+                int y = i / m_num_cols;
+                if (x >= m_trace_region[0] && x <= m_trace_region[2] &&
+                    y >= m_trace_region[1] && y <= m_trace_region[3])
+                    m_trace_router_mask[i] = true;
+            }
+        } else if (!m_trace_region.empty()) {
+            std::cout << "trace_region needs x0,y0,x1,y1 and a 2D topology,"
+                      << " ignoring it" << std::endl;
+        }
+    }
+
     // FaultModel: declare each router to the fault model
     if (isFaultModelEnabled()) {
         for (vector<Router*>::const_iterator i= m_routers.begin();
@@ -179,7 +227,9 @@ GarnetNetwork::init()
             router->printFaultVector(cout);
         }
     }
-    loupeFile << *this;
+    *loupeFileptr << *this;
+    // keep the header in its own block when compressing
+    loupeFileptr->flush();
 }
 
 GarnetNetwork::~GarnetNetwork()
@@ -188,6 +238,11 @@ GarnetNetwork::~GarnetNetwork()
     deletePointers(m_nis);
     deletePointers(m_networklinks);
     deletePointers(m_creditlinks);
+	if (loupeTraceBuf != NULL) {
+		loupeTraceBuf->close();
+		delete loupeTraceStream;
+		delete loupeTraceBuf;
+	}
 	loupeFile.close();
 	hotspotStatFile.close();
 }
@@ -212,8 +267,8 @@ GarnetNetwork::makeExtInLink(NodeID src, SwitchID dest, BasicLink* link,
     net_link->setType(EXT_IN_);
     CreditLink* credit_link = garnet_link->m_credit_links[LinkDirection_In];
 
-    net_link->init_loupe_ptr(loupeFileptr);
-    credit_link->init_loupe_ptr(loupeFileptr);
+    net_link->init_loupe_ptr(loupeFileptr, this, dest);
+    credit_link->init_loupe_ptr(loupeFileptr, this, dest);
 
     m_networklinks.push_back(net_link);
     m_creditlinks.push_back(credit_link);
@@ -244,8 +299,8 @@ GarnetNetwork::makeExtOutLink(SwitchID src, NodeID dest, BasicLink* link,
     net_link->setType(EXT_OUT_);
     CreditLink* credit_link = garnet_link->m_credit_links[LinkDirection_Out];
 
-    net_link->init_loupe_ptr(loupeFileptr);
-    credit_link->init_loupe_ptr(loupeFileptr);
+    net_link->init_loupe_ptr(loupeFileptr, this, src);
+    credit_link->init_loupe_ptr(loupeFileptr, this, src);
 
     m_networklinks.push_back(net_link);
     m_creditlinks.push_back(credit_link);
@@ -275,12 +330,16 @@ GarnetNetwork::makeInternalLink(SwitchID src, SwitchID dest, BasicLink* link,
     net_link->setType(INT_);
     CreditLink* credit_link = garnet_link->m_credit_link;
 
-    net_link->init_loupe_ptr(loupeFileptr);
-    credit_link->init_loupe_ptr(loupeFileptr);
+    net_link->init_loupe_ptr(loupeFileptr, this, dest);
+    credit_link->init_loupe_ptr(loupeFileptr, this, dest);
 
     m_networklinks.push_back(net_link);
     m_creditlinks.push_back(credit_link);
 
+    LoupeInPort inport = {m_routers[dest]->get_num_inports(),
+                          dst_inport_dirn, src};
+    m_router_inports[dest].push_back(inport);
+
     m_routers[dest]->addInPort(dst_inport_dirn, net_link, credit_link);
     m_routers[src]->addOutPort(src_outport_dirn, net_link,
                                routing_table_entry,
@@ -478,7 +537,8 @@ GarnetNetwork::collateStats()
     }
 
 	//Loupe
-	loupeFile << "End of sim," <<std::endl;;
+	loupeFileptr->flush();
+	*loupeFileptr << "End of sim," <<std::endl;
 
 }
 
@@ -486,11 +546,28 @@ void
 GarnetNetwork::print(ostream& out) const
 {
     // out << "[GarnetNetwork]";
-    out << m_num_rows * m_num_cols << ",";
+    int max_ports = 0;
+    for (int i = 0; i < m_router_inports.size(); i++) {
+        max_ports = max(max_ports, (int)m_router_inports[i].size());
+    }
+    out << m_routers.size() << ",";
     out << m_num_rows << ",";
     out << m_vcs_per_vnet << ",";
-    out << m_virtual_networks;
+    out << m_virtual_networks << ",";
+    out << max_ports;
     out << ",\n";
+
+    // Loupe: one line per router listing its internal input ports as
+    // input unit index, direction, upstream router triples
+    for (int i = 0; i < m_router_inports.size(); i++) {
+        out << "Ports," << i << ",";
+        for (int j = 0; j < m_router_inports[i].size(); j++) {
+            out << m_router_inports[i][j].port << ","
+                << m_router_inports[i][j].direction << ","
+                << m_router_inports[i][j].src << ",";
+        }
+        out << "\n";
+    }
 }
 
 GarnetNetwork *
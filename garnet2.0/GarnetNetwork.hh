@@ -42,6 +42,7 @@
 #include "mem/ruby/network/Network.hh"
 #include "mem/ruby/network/fault_model/FaultModel.hh"
 #include "mem/ruby/network/garnet2.0/CommonTypes.hh"
+#include "mem/ruby/network/garnet2.0/LoupeTraceBuf.hh"
 #include "params/GarnetNetwork.hh"
 
 class FaultModel;
@@ -73,11 +74,36 @@ class GarnetNetwork : public Network
 
     //For Loupe
     std::ofstream loupeFile;
-    std::ofstream * loupeFileptr;
-    std::ofstream * getLoupeFileptr() { return loupeFileptr; }
+    std::ostream * loupeFileptr;
+    std::ostream * getLoupeFileptr() { return loupeFileptr; }
+
+    // compressed trace, loupeFileptr writes through these when enabled
+    LoupeTraceBuf * loupeTraceBuf;
+    std::ostream * loupeTraceStream;
 
 	std::ofstream hotspotStatFile;
 
+    // Loupe trace filtering
+    bool
+    traceEvent(Cycles cycle, int router_id, int vnet, trace_event_type type)
+    {
+        if (!m_trace_event_on[type])
+            return false;
+        if (cycle < m_trace_start_cycle)
+            return false;
+        if (m_trace_end_cycle >= 0 &&
+            uint64_t(cycle) > uint64_t(m_trace_end_cycle))
+            return false;
+        if (!m_trace_router_mask.empty() && !m_trace_router_mask[router_id])
+            return false;
+        if (!m_trace_vnet_mask.empty() && !m_trace_vnet_mask[vnet])
+            return false;
+        if (m_trace_sample > 1 &&
+            (m_trace_sample_count++ % uint64_t(m_trace_sample)))
+            return false;
+        return true;
+    }
+
     // for network
     uint32_t getNiFlitSize() const { return m_ni_flit_size; }
     uint32_t getVCsPerVnet() const { return m_vcs_per_vnet; }
@@ -215,6 +241,16 @@ class GarnetNetwork : public Network
     std::vector<CreditLink *> m_creditlinks; // All credit links in the network
     std::vector<NetworkInterface *> m_nis;   // All NI's in Network
 
+    // Loupe: input unit index, direction and upstream router of every
+    // router's internal input ports, printed to the trace header
+    struct LoupeInPort
+    {
+        int port;
+        PortDirection direction;
+        SwitchID src;
+    };
+    std::vector<std::vector<LoupeInPort> > m_router_inports;
+
 	//  hotspot varibales
 	//  crom cmdline
 	int hotspot_detect_on;
@@ -224,6 +260,17 @@ class GarnetNetwork : public Network
 	// internal
 	int next_hotspot_processing_cycle;
 
+    // Loupe trace filters
+    Cycles m_trace_start_cycle;
+    int64_t m_trace_end_cycle;
+    std::vector<int> m_trace_routers;
+    std::vector<int> m_trace_region;
+    std::vector<bool> m_trace_router_mask; // empty traces all routers
+    std::vector<bool> m_trace_vnet_mask; // empty traces all vnets
+    bool m_trace_event_on[NUM_TRACE_EVENT_TYPES_];
+    int m_trace_sample;
+    uint64_t m_trace_sample_count;
+
 
 
 };
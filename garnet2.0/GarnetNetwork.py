@@ -49,6 +49,38 @@ class GarnetNetwork(RubyNetwork):
     garnet_deadlock_threshold = Param.UInt32(50000,
                               "network-level deadlock threshold")
 
+    # hotspot detection / Loupe trace
+    hotspot_detect = Param.Int(0, "hotspot detector on or off");
+    hotspot_cutoff = Param.Int(-1,
+        "number of hotspots to report, -1 for all routers");
+    hotspot_period = Param.Int(-1,
+        "hotspot sampling period in cycles, -1 for whole simulation");
+    hotspot_topology = Param.String("",
+        "topology name written to the trace header");
+    hotspot_sim_cycles = Param.Int(-1,
+        "simulation cycles written to the trace header");
+    loupe_trace_file = Param.String("LoupeTraceFile.csv",
+        "path of the flit trace file");
+    hotspot_stat_file = Param.String("hotspotStatFile.txt",
+        "path of the hotspot tracking output file");
+    trace_compression = Param.Int(0,
+        "zlib level (1-9) for a block compressed trace, 0 for plain text");
+    trace_block_size = Param.UInt32(1048576,
+        "uncompressed bytes per compressed trace block");
+
+    # Loupe trace filtering, applied before an event is written
+    trace_start_cycle = Param.Int(0, "first cycle to trace");
+    trace_end_cycle = Param.Int(-1,
+        "last cycle to trace, -1 for end of simulation");
+    trace_routers = VectorParam.Int([], "router ids to trace, empty for all");
+    trace_region = VectorParam.Int([],
+        "mesh region to trace as x0, y0, x1, y1 (inclusive), empty for all");
+    trace_vnets = VectorParam.Int([], "vnets to trace, empty for all");
+    trace_events = Param.String("all",
+        "events to trace: all, InUnit or Link");
+    trace_sample = Param.Int(1,
+        "trace one in every N events that pass the filters");
+
 class GarnetNetworkInterface(ClockedObject):
     type = 'GarnetNetworkInterface'
     cxx_class = 'NetworkInterface'
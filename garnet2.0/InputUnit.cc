@@ -139,13 +139,17 @@ InputUnit::wakeup()
 
         //David Added
         GarnetNetwork* net_ptr = m_router->get_net_ptr();
-        ofstream* file_ptr = net_ptr->getLoupeFileptr();
-        *file_ptr  << m_router->curCycle() << ",";
-        *file_ptr  << "InUnit,";
-        *file_ptr  << m_router->get_id() << ",";
-        *file_ptr  << m_direction << ",";
-        *file_ptr  << *t_flit << ",";
-        *file_ptr  << get_outport(vc) << ",\n";
+        if (net_ptr->traceEvent(m_router->curCycle(), m_router->get_id(),
+                                vnet, TRACE_INUNIT_)) {
+            ostream* file_ptr = net_ptr->getLoupeFileptr();
+            *file_ptr  << m_router->curCycle() << ",";
+            *file_ptr  << "InUnit,";
+            *file_ptr  << m_router->get_id() << ",";
+            *file_ptr  << m_direction << ",";
+            *file_ptr  << *t_flit << ",";
+            *file_ptr  << get_outport(vc) << ",";
+            *file_ptr  << m_id << ",\n";
+        }
     }
 }
 
@@ -0,0 +1,154 @@
+/*
+ * Streaming compressor for the Loupe trace file.
+ * See LoupeTraceBuf.hh for the file and index layout.
+ */
+
+
+#include "mem/ruby/network/garnet2.0/LoupeTraceBuf.hh"
+
+#include <cctype>
+#include <cstdlib>
+#include <cstring>
+
+#include "base/logging.hh"
+
+using namespace std;
+
+LoupeTraceBuf::LoupeTraceBuf(ostream *out, const string &index_file,
+                             int level, size_t block_size)
+    : m_out(out), m_buf(block_size), m_offset(0), m_closed(false)
+{
+    if (level < 1 || level > 9)
+        fatal("Loupe trace compression level %d is not in 1-9", level);
+    if (block_size == 0)
+        fatal("Loupe trace block size should be more than 0");
+
+    m_index.open(index_file.c_str(), ofstream::out);
+    m_index << "offset,compressed_bytes,raw_bytes,first_cycle,last_cycle\n";
+
+    memset(&m_zstream, 0, sizeof(m_zstream));
+    // windowBits 15 + 16 writes a gzip header and trailer for every block
+    int ret = deflateInit2(&m_zstream, level, Z_DEFLATED,
+                           15 + 16, 8, Z_DEFAULT_STRATEGY);
+    if (ret != Z_OK)
+        fatal("Could not initialize zlib for the Loupe trace (error %d)", ret);
+
+    setp(m_buf.data(), m_buf.data() + m_buf.size());
+}
+
+LoupeTraceBuf::~LoupeTraceBuf()
+{
+    close();
+    deflateEnd(&m_zstream);
+}
+
+void
+LoupeTraceBuf::close()
+{
+    if (m_closed)
+        return;
+    sync();
+    m_index.close();
+    m_closed = true;
+}
+
+// The buffer is full: compress every complete line and keep the partial
+// last line for the next block.
+int
+LoupeTraceBuf::overflow(int c)
+{
+    size_t used = pptr() - pbase();
+    size_t len = used;
+    for (size_t i = used; i > 0; i--) {
+        if (pbase()[i - 1] == '\n') {
+            len = i;
+            break;
+        }
+    }
+    writeBlock(len);
+
+    size_t remaining = used - len;
+    memmove(m_buf.data(), m_buf.data() + len, remaining);
+    setp(m_buf.data(), m_buf.data() + m_buf.size());
+    pbump(remaining);
+
+    if (c != traits_type::eof()) {
+        *pptr() = traits_type::to_char_type(c);
+        pbump(1);
+    }
+    return traits_type::not_eof(c);
+}
+
+// Flushing the stream ends the current block, even if it is not full.
+int
+LoupeTraceBuf::sync()
+{
+    writeBlock(pptr() - pbase());
+    setp(m_buf.data(), m_buf.data() + m_buf.size());
+    m_out->flush();
+    m_index.flush();
+    return 0;
+}
+
+void
+LoupeTraceBuf::writeBlock(size_t len)
+{
+    if (len == 0)
+        return;
+
+    const char *begin = pbase();
+    const char *end = pbase() + len;
+
+    deflateReset(&m_zstream);
+    m_zbuf.resize(deflateBound(&m_zstream, len) + 64);
+    m_zstream.next_in = (Bytef *)begin;
+    m_zstream.avail_in = len;
+    m_zstream.next_out = (Bytef *)m_zbuf.data();
+    m_zstream.avail_out = m_zbuf.size();
+    int ret = deflate(&m_zstream, Z_FINISH);
+    if (ret != Z_STREAM_END)
+        fatal("Compressing a Loupe trace block failed (error %d)", ret);
+
+    size_t out_len = m_zstream.total_out;
+    m_out->write(m_zbuf.data(), out_len);
+
+    m_index << m_offset << "," << out_len << "," << len << ","
+            << firstCycle(begin, end) << "," << lastCycle(begin, end)
+            << "\n";
+    m_offset += out_len;
+}
+
+// Cycle of the first trace row in [begin, end), or -1 if there is none.
+// Trace rows are the only lines starting with a digit.
+int64_t
+LoupeTraceBuf::firstCycle(const char *begin, const char *end)
+{
+    const char *line = begin;
+    while (line < end) {
+        if (isdigit(*line))
+            return strtoll(line, nullptr, 10);
+        line = (const char *)memchr(line, '\n', end - line);
+        if (line == nullptr)
+            break;
+        line++;
+    }
+    return -1;
+}
+
+// Cycle of the last trace row in [begin, end), or -1 if there is none.
+int64_t
+LoupeTraceBuf::lastCycle(const char *begin, const char *end)
+{
+    const char *line_end = end;
+    if (line_end > begin && line_end[-1] == '\n')
+        line_end--;
+    while (line_end > begin) {
+        const char *line = line_end;
+        while (line > begin && line[-1] != '\n')
+            line--;
+        if (isdigit(*line))
+            return strtoll(line, nullptr, 10);
+        line_end = line - 1;
+    }
+    return -1;
+}
@@ -0,0 +1,54 @@
+/*
+ * Streaming compressor for the Loupe trace file.
+ *
+ * Trace text is collected into blocks of whole lines. Each block is written
+ * as its own gzip member, so the file can be read by any gzip reader, and
+ * a block can be decompressed on its own. For every block a line
+ * "offset,compressed_bytes,raw_bytes,first_cycle,last_cycle" is appended to
+ * the index file, which lets a reader pick out a range of cycles without
+ * decompressing the whole trace. Blocks holding no trace rows (the header
+ * and the end of sim trailer) are indexed with cycles -1.
+ */
+
+
+#ifndef __MEM_RUBY_NETWORK_GARNET2_0_LOUPETRACEBUF_HH__
+#define __MEM_RUBY_NETWORK_GARNET2_0_LOUPETRACEBUF_HH__
+
+#include <zlib.h>
+
+#include <cstdint>
+#include <fstream>
+#include <iostream>
+#include <streambuf>
+#include <string>
+#include <vector>
+
+class LoupeTraceBuf : public std::streambuf
+{
+  public:
+    LoupeTraceBuf(std::ostream *out, const std::string &index_file,
+                  int level, size_t block_size);
+    ~LoupeTraceBuf();
+
+    // compress any buffered text and flush the trace and index files
+    void close();
+
+  protected:
+    int overflow(int c);
+    int sync();
+
+  private:
+    void writeBlock(size_t len);
+    static int64_t firstCycle(const char *begin, const char *end);
+    static int64_t lastCycle(const char *begin, const char *end);
+
+    std::ostream *m_out;
+    std::ofstream m_index;
+    z_stream m_zstream;
+    std::vector<char> m_buf;
+    std::vector<char> m_zbuf;
+    uint64_t m_offset;
+    bool m_closed;
+};
+
+#endif //__MEM_RUBY_NETWORK_GARNET2_0_LOUPETRACEBUF_HH__
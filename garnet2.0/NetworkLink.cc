@@ -42,6 +42,7 @@ NetworkLink::NetworkLink(const Params *p)
     : ClockedObject(p), Consumer(this), m_id(p->link_id),
       m_type(NUM_LINK_TYPES_),
       m_latency(p->link_latency),
+      loupeFileptr(nullptr), m_net_ptr(nullptr), m_trace_router(-1),
       linkBuffer(new flitBuffer()), link_consumer(nullptr),
       link_srcQueue(nullptr), m_link_utilized(0),
       m_vc_load(p->vcs_per_vnet * p->virt_nets)
@@ -76,7 +77,9 @@ NetworkLink::wakeup()
         m_link_utilized++;
         m_vc_load[t_flit->get_vc()]++;
         //Loupe
-        if (t_flit->get_id() != 0) {
+        if (t_flit->get_id() != 0 &&
+            m_net_ptr->traceEvent(curCycle(), m_trace_router,
+                                  t_flit->get_vnet(), TRACE_LINK_)) {
             *loupeFileptr << curCycle() << ",";
             *loupeFileptr << "Link,";
             *loupeFileptr << m_id << ",";
@@ -61,9 +61,13 @@ class NetworkLink : public ClockedObject, public Consumer
     int get_id() const { return m_id; }
     void wakeup();
 
-    void init_loupe_ptr(std::ofstream* Fileptr)
+    // trace_router is the router this link's events are filtered by
+    void init_loupe_ptr(std::ostream* Fileptr, GarnetNetwork* net_ptr,
+                        int trace_router)
     {
       loupeFileptr = Fileptr;
+      m_net_ptr = net_ptr;
+      m_trace_router = trace_router;
     }
 
     unsigned int getLinkUtilization() const { return m_link_utilized; }
@@ -84,7 +88,9 @@ class NetworkLink : public ClockedObject, public Consumer
     const Cycles m_latency;
 
     //for loupe
-    std::ofstream * loupeFileptr;
+    std::ostream * loupeFileptr;
+    GarnetNetwork *m_net_ptr;
+    int m_trace_router;
 
     flitBuffer *linkBuffer;
     Consumer *link_consumer;
@@ -100,6 +100,50 @@ parser.add_option("--hotspot-visualizer", type="int", default=0,
 		                  help="visualize hotspot at the end.\
 								Set to 0 for off.")
 
+parser.add_option("--loupe-trace-file", type="string",
+                  default="LoupeTraceFile.csv",
+                  help="path of the flit trace file written by garnet")
+
+parser.add_option("--hotspot-stat-file", type="string",
+                  default="hotspotStatFile.txt",
+                  help="path of the hotspot tracking output file")
+
+parser.add_option("--trace-compress", type="int", default=0,
+                  help="write the trace as block compressed gzip with this\
+                        zlib level (1-9), along with a block index file.\
+                        Set to 0 for a plain text trace.")
+
+parser.add_option("--trace-block-size", type="int", default=1048576,
+                  help="uncompressed bytes per compressed trace block")
+
+parser.add_option("--trace-start", type="int", default=0,
+                  help="first cycle written to the trace file")
+
+parser.add_option("--trace-end", type="int", default=-1,
+                  help="last cycle written to the trace file.\
+                        Set to -1 to trace until the end of simulation.")
+
+parser.add_option("--trace-routers", type="string", default="",
+                  help="comma separated router ids to trace (eg. 0,1,8).\
+                        Leave empty to trace all routers.")
+
+parser.add_option("--trace-region", type="string", default="",
+                  help="rectangular mesh region to trace as x0,y0,x1,y1\
+                        (inclusive, x is the column and y the row).\
+                        Combined with --trace-routers if both are given.")
+
+parser.add_option("--trace-vnets", type="string", default="",
+                  help="comma separated vnets to trace.\
+                        Leave empty to trace all vnets.")
+
+parser.add_option("--trace-events", type="choice", default="all",
+                  choices=['all', 'InUnit', 'Link'],
+                  help="trace only router input unit or only link events")
+
+parser.add_option("--trace-sample", type="int", default=1,
+                  help="write only 1 in N of the trace events that pass\
+                        the other filters")
+
 
 
 
@@ -125,19 +169,37 @@ if options.inj_vnet > 2:
 
 print("options.hotspot_cutoff:", options.hotspot_cutoff)
 
-hs_cfg=open("hotspot_config.txt", "w")
-hs_cfg.write(str(options.hotspot_detect))
-hs_cfg.write("\n")
-hs_cfg.write(str(options.hotspot_cutoff))
-hs_cfg.write("\n")
-hs_cfg.write(str(options.hotspot_period))
-hs_cfg.write("\n")
-hs_cfg.write(options.topology)
-hs_cfg.write("\n")
-hs_cfg.write(str(options.sim_cycles))
-hs_cfg.write("\n")
-
-hs_cfg.close()
+def int_list(opt_str):
+    return [int(x) for x in opt_str.split(",") if x.strip() != ""]
+
+trace_routers = int_list(options.trace_routers)
+trace_region = int_list(options.trace_region)
+trace_vnets = int_list(options.trace_vnets)
+
+if trace_region and len(trace_region) != 4:
+    print("Error: --trace-region takes four values x0,y0,x1,y1")
+    sys.exit(1)
+
+if options.trace_start < 0:
+    print("Error: --trace-start should be 0 or more")
+    sys.exit(1)
+
+if options.trace_end != -1 and options.trace_end < options.trace_start:
+    print("Error: --trace-end should be -1 or at least --trace-start")
+    sys.exit(1)
+
+if options.trace_sample < 1:
+    print("Error: --trace-sample should be 1 or more")
+    sys.exit(1)
+
+if options.trace_compress < 0 or options.trace_compress > 9:
+    print("Error: --trace-compress should be a zlib level 1-9, or 0 for no compression")
+    sys.exit(1)
+
+if options.trace_block_size < 1:
+    print("Error: --trace-block-size should be 1 or more")
+    sys.exit(1)
+
 cpus = [ GarnetSyntheticTraffic(
                      num_packets_max=options.num_packets_max,
                      single_sender=options.single_sender_id,
@@ -162,6 +224,26 @@ system.clk_domain = SrcClockDomain(clock = options.sys_clock,
 
 Ruby.create_system(options, False, system)
 
+# hotspot detection and trace output settings for GarnetNetwork
+system.ruby.network.hotspot_detect = options.hotspot_detect
+system.ruby.network.hotspot_cutoff = options.hotspot_cutoff
+system.ruby.network.hotspot_period = options.hotspot_period
+system.ruby.network.hotspot_topology = options.topology
+system.ruby.network.hotspot_sim_cycles = options.sim_cycles
+system.ruby.network.loupe_trace_file = options.loupe_trace_file
+system.ruby.network.hotspot_stat_file = options.hotspot_stat_file
+system.ruby.network.trace_compression = options.trace_compress
+system.ruby.network.trace_block_size = options.trace_block_size
+
+# trace filters, applied in garnet before trace events are written
+system.ruby.network.trace_start_cycle = options.trace_start
+system.ruby.network.trace_end_cycle = options.trace_end
+system.ruby.network.trace_routers = trace_routers
+system.ruby.network.trace_region = trace_region
+system.ruby.network.trace_vnets = trace_vnets
+system.ruby.network.trace_events = options.trace_events
+system.ruby.network.trace_sample = options.trace_sample
+
 # Create a seperate clock domain for Ruby
 system.ruby.clk_domain = SrcClockDomain(clock = options.ruby_clock,
                                         voltage_domain = system.voltage_domain)
@@ -190,8 +272,6 @@ m5.instantiate()
 # simulate until program terminates
 exit_event = m5.simulate(options.abs_max_tick)
 
-os.remove("hotspot_config.txt")
-
 print('Exiting @ tick', m5.curTick(), 'because', exit_event.getCause())
 
 
@@ -12,42 +12,51 @@ import numpy as np
 from scipy.signal import fftconvolve
 import cv2 as cv
 
-num_ports = 4 # 2D mesh, 4 ports - excluding local port
+from hotspot_profiling import traced
 
-def create_heat_maps(cycle_data, topology_info):
+@traced()
+def create_heat_maps(cycle_data, net_topology):
     """
     Parses the cycle data read from a .csv file into labeling of number of flits
     arriving at each router each cycle.
 
     Inputs:
         cycle_data - cycle_data output by parseData
-        topology_info - topology information output by parseData
+        net_topology - Topology output by parseData
     Outputs:
-        heat_map - (sim_cycles, num_routers) array representing the number of
-                   flits arriving at each router at each cycle.
-                   For mesh, there can be at most 5 each cycle (4 links + local port)
+        heat_map_routers - (sim_cycles, num_routers) array representing the number of
+                           flits arriving at each router at each cycle, excluding the local port.
+                           There can be at most net_topology.max_ports each cycle.
+        heat_map_ports - (sim_cycles, net_topology.num_ports) array with 1 where a flit arrives
+                         at the port slot that cycle
     """
 
-    port_directions = ["North", "East", "South", "West"]
     sim_cycles = cycle_data[-1]["cycle"]
-    routers = cycle_data[cycle_data["unit"] == "InUnit"]
-
-    heat_map_routers = np.zeros((sim_cycles, topology_info[1]))
-    heat_map_ports = np.zeros((sim_cycles, topology_info[1]*num_ports))
-
-    for i in range(topology_info[1]):
-        # calculate heat map for routers
-        router_cycles = routers[np.logical_and(routers["unit_ID"] == i, routers["direction"] != "Local")]["cycle"] - 1
-        num_flits = np.bincount(router_cycles)
-        num_flits = num_flits[np.nonzero(num_flits)]
-        heat_map_routers[np.unique(router_cycles),i] = num_flits
-
-        # calculate heat map for ports
-        for j in range(len(port_directions)):
-            dir_cycles = routers[np.logical_and(routers["unit_ID"] == i, routers["direction"] == port_directions[j])]["cycle"] - 1
-            heat_map_ports[dir_cycles,(i*num_ports)+j] = 1
+    num_routers = net_topology.num_routers
+    # select fields rather than whole rows, the records are large
+    arrivals = np.logical_and(cycle_data["unit"] == "InUnit", cycle_data["direction"] != "Local")
+    router_cycles = cycle_data["cycle"][arrivals] - 1
+    router_ids = cycle_data["unit_ID"][arrivals]
+
+    # calculate heat map for routers
+    heat_map_routers = np.bincount(router_cycles.astype(np.int64) * num_routers + router_ids,
+                                   minlength=sim_cycles*num_routers).reshape(sim_cycles, num_routers).astype(float)
+
+    # calculate heat map for ports
+    heat_map_ports = np.zeros((sim_cycles, net_topology.num_ports))
+    # ports are identified by input unit index, or by direction name in older traces
+    inports = cycle_data["inport"][arrivals]
+    indexed = inports >= 0
+    slots = np.full(len(inports), -1, dtype=np.int64)
+    if indexed.any():
+        slots[indexed] = net_topology.port_slots(router_ids[indexed], inports[indexed])
+    if not indexed.all():
+        slots[~indexed] = net_topology.direction_slots(router_ids[~indexed], cycle_data["direction"][arrivals][~indexed])
+    heat_map_ports[router_cycles[slots >= 0], slots[slots >= 0]] = 1
+
     return heat_map_routers, heat_map_ports
 
+@traced()
 def heat_map_window(heat_map, time_window, window_offset, normalize_opt):
     """
     Computes the average flit activity from a heat map over a window.
@@ -73,6 +82,7 @@ def heat_map_window(heat_map, time_window, window_offset, normalize_opt):
     else:
         return np.sum(heat_map[window_offset:window_offset+time_window,:], axis=0) / max_flit
 
+@traced()
 def heat_map_window_all(heat_map, time_window):
     """
     Computes the average flit activity from a heat map over a sliding window.
@@ -90,6 +100,7 @@ def heat_map_window_all(heat_map, time_window):
 
     return heat_map_all
 
+@traced()
 def create_colormap(heat_map, window_size=100):
     """
     Computes the colormap as an interpolation of router activity to the colormap JET from the
@@ -113,6 +124,152 @@ def create_colormap(heat_map, window_size=100):
 
     return color_map
 
+# data type for the top-N ranking of windows
+top_n_dtype = [
+    ("window", "i4"),   # offset of the window, in cycles
+    ("rank", "i2"),     # 0 for the most active
+    ("router", "i4"),   # column of the heat map: router, or port slot for port heat maps
+    ("activity", "f4"), # average activity over the window
+]
+
+def _strided_prefix(heat_map, start, stride, dtype):
+    """ Prefix sums of the heat map, summed over the cycles before start, start+stride, start+2*stride, ... """
+
+    num_blocks = (heat_map.shape[0] - start) // stride
+    blocks = heat_map[start:start+num_blocks*stride]
+    if stride > 1:
+        blocks = blocks.reshape(num_blocks, stride, heat_map.shape[1]).sum(axis=1, dtype=dtype)
+    prefix = np.empty((num_blocks+1, heat_map.shape[1]), dtype=dtype)
+    prefix[0] = heat_map[:start].sum(axis=0, dtype=dtype)
+    np.cumsum(blocks, axis=0, dtype=dtype, out=prefix[1:])
+    if start > 0:
+        prefix[1:] += prefix[0]
+    return prefix
+
+def _select_top_n(sums, n):
+    """
+    Top n columns of each row of window sums, most active first and ties by lowest column.
+
+    Outputs:
+        (selected columns, their sums), both (rows, n)
+    """
+
+    # sum of the n-th most active in each window, then select everything above it
+    # and as many of the columns tied with it as needed, lowest first
+    top = np.argpartition(-sums, n-1, axis=1)[:, :n]
+    kth = np.take_along_axis(sums, top, axis=1).min(axis=1)[:, None]
+    above = sums > kth
+    ties = sums == kth
+    ties &= np.cumsum(ties, axis=1) <= n - np.count_nonzero(above, axis=1)[:, None]
+    selected = np.nonzero(above | ties)[1].reshape(-1, n)
+
+    # order the selection by activity
+    activity = np.take_along_axis(sums, selected, axis=1)
+    order = np.argsort(-activity, axis=1, kind='stable')
+    return np.take_along_axis(selected, order, axis=1), np.take_along_axis(activity, order, axis=1)
+
+@traced()
+def top_n_windows(heat_map, time_window, n, stride=1, scale=1.0, chunk_size=1<<20):
+    """
+    Ranks the n most active routers or ports of every sliding window over the heat map.
+    Window sums are taken from prefix sums of the heat map and the top n of each window
+    selected with argpartition, a chunk of windows at a time to bound memory.
+    Ties are ranked by lowest router or port, as in a stable sort.
+
+    The heat map should hold flit counts, as output by create_heat_maps, so window sums are
+    exact and ties are found reliably. Integer heat maps are summed as int64, float heat maps
+    of counts as float64, which is exact as well. Normalize the reported activity with scale
+    rather than normalizing the heat map.
+
+    Inputs:
+        heat_map - heat map for routers, ports, or links
+        time_window - number of cycles to average over
+        n - number of routers or ports to rank in each window
+        stride - cycles between ranked window offsets
+        scale - factor applied to the reported activity, e.g. 1/max_ports
+        chunk_size - heat map entries processed at once
+    Outputs:
+        ranking - array of top_n_dtype, n entries per window ordered by window offset then rank
+        time_in_top_n - number of ranked windows each router or port is among the top n in
+    """
+
+    if time_window < 1 or stride < 1:
+        raise ValueError("time_window and stride should be 1 or more")
+
+    sim_cycles, num_units = heat_map.shape
+    n = min(n, num_units)
+    offsets = np.arange(0, sim_cycles - time_window + 1, stride)
+
+    ranking = np.zeros(len(offsets)*n, dtype=top_n_dtype)
+    time_in_top_n = np.zeros(num_units, dtype=np.int64)
+    if n <= 0 or len(offsets) == 0:
+        return ranking, time_in_top_n
+
+    # prefix sums only at the window starts and ends, so a stride also saves memory
+    dtype = np.int64 if np.issubdtype(heat_map.dtype, np.integer) else np.float64
+    start_prefix = _strided_prefix(heat_map, 0, stride, dtype)
+    if time_window % stride == 0:
+        end_prefix = start_prefix
+    else:
+        end_prefix = _strided_prefix(heat_map, time_window % stride, stride, dtype)
+    end_shift = time_window // stride
+
+    chunk_windows = max(1, chunk_size // num_units)
+    for start in range(0, len(offsets), chunk_windows):
+        window_offsets = offsets[start:start+chunk_windows]
+        windows = np.arange(start, start+len(window_offsets))
+        sums = end_prefix[windows + end_shift] - start_prefix[windows]
+
+        selected, activity = _select_top_n(sums, n)
+
+        entries = ranking[start*n:(start+len(window_offsets))*n]
+        entries["window"] = np.repeat(window_offsets, n)
+        entries["rank"] = np.tile(np.arange(n), len(window_offsets))
+        entries["router"] = selected.ravel()
+        entries["activity"] = activity.ravel() * (scale / time_window)
+        time_in_top_n += np.bincount(selected.ravel(), minlength=num_units)
+
+    return ranking, time_in_top_n
+
+def top_n_window(heat_map, time_window, window_offset, n):
+    """
+    Ranks the n most active routers or ports of a single window, in the same order as top_n_windows.
+
+    Inputs:
+        heat_map - heat map for routers, ports, or links, holding flit counts
+        time_window - number of cycles to average over
+        window_offset - cycle offset for position of window within the heat_map array
+        n - number of routers or ports
+    Outputs:
+        routers or ports, most active first
+    """
+
+    n = min(n, heat_map.shape[1])
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    dtype = np.int64 if np.issubdtype(heat_map.dtype, np.integer) else np.float64
+    sums = heat_map[window_offset:window_offset+time_window].sum(axis=0, dtype=dtype)
+    return _select_top_n(sums[None, :], n)[0][0]
+
+def most_active_at(ranking, window_offset, n):
+    """
+    Looks up the n most active routers or ports of a window in a ranking from top_n_windows.
+
+    Inputs:
+        ranking - ranking output by top_n_windows
+        window_offset - cycle offset of the window, the closest ranked window at or before it is used
+        n - number of routers or ports, at most the n the ranking was computed for
+    Outputs:
+        routers or ports, most active first
+    """
+
+    windows = ranking["window"]
+    if len(windows) == 0:
+        return ranking["router"]
+    window = windows[max(np.searchsorted(windows, window_offset, side='right') - 1, 0)]
+    lo, hi = np.searchsorted(windows, window, side='left'), np.searchsorted(windows, window, side='right')
+    return ranking["router"][lo:min(hi, lo+n)]
+
 def trackbar_nothing(val):
     """ Trackbars require a callback function. Feature not used, so use this
         function which does nothing.
@@ -0,0 +1,306 @@
+"""
+Lightweight instrumentation for the parse and visualization pipeline.
+
+Records nested timing spans with the peak RSS reached during each span, named counters
+(rows, bytes, ...) and frame time histograms for the GUI loops. Everything is written on
+exit to a single JSON file in Chrome trace format, which can be opened in chrome://tracing
+or https://ui.perfetto.dev, with a per stage summary, counters and histograms alongside
+the trace events.
+
+Disabled by default, in which case span() returns a shared no-op context manager and the
+other calls return immediately. Enable it with
+    HOTSPOT_PROFILE=out.json python ...
+(HOTSPOT_PROFILE=1 writes hotspot_profile.json) or with the --profile[=out.json] flag of
+parse_data.py and the visualizers.
+
+Setting HOTSPOT_PROFILE_CPROFILE to a comma separated list of span names (or "all") also
+runs those spans under cProfile, writing <out>.<span name>.<n>.prof files that can be
+read with pstats or snakeviz. Only the outermost of nested profiled spans is captured.
+
+The peak RSS of a span is exact on Linux, where the process high water mark is reset
+through /proc/self/clear_refs when a span starts. Elsewhere it is the process high water
+mark if the span raised it, and otherwise the larger of the RSS at the start and end of
+the span, a lower bound.
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+enabled = False
+output_file = None
+
+default_output = "hotspot_profile.json"
+
+# upper bounds of the frame time histogram buckets, in ms
+frame_buckets_ms = [1, 2, 4, 8, 16, 33, 66, 133, 266, 533, 1000, float("inf")]
+
+_events = []
+_counters = defaultdict(int)
+_histograms = {}
+_last_frame = {}
+_depth = 0
+_cprofile_spans = set()
+_cprofile_all = False
+_cprofile_active = False
+_cprofile_count = defaultdict(int)
+_open_spans = [] # innermost last
+_peak_resettable = None
+_start = time.perf_counter()
+
+def _rss_kb():
+    """ Current resident set size in KB, or -1 if unavailable. """
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return -1
+
+def _max_rss_kb():
+    """ Peak resident set size of the process so far (or since the last reset) in KB, or -1 if unavailable. """
+
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+    except ImportError: # not available on Windows
+        return -1
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+def _reset_peak():
+    """ Resets the process high water mark to the current RSS, returns False if this is not supported. """
+
+    global _peak_resettable
+
+    if _peak_resettable is False:
+        return False
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        _peak_resettable = True
+    except OSError:
+        _peak_resettable = False
+    return _peak_resettable
+
+def env_output():
+    """ Output file set by HOTSPOT_PROFILE, default_output for HOTSPOT_PROFILE=1, or None. """
+
+    path = os.environ.get("HOTSPOT_PROFILE")
+    if not path:
+        return None
+    return default_output if path == "1" else path
+
+def enable(path=default_output, cprofile_spans=None):
+    """
+    Turns instrumentation on and writes the results to path at exit.
+
+    Inputs:
+        path - output JSON (Chrome trace format)
+        cprofile_spans - span names to also run under cProfile, "all" for every span
+    """
+
+    global enabled, output_file, _cprofile_all
+
+    if not enabled:
+        atexit.register(write)
+    enabled = True
+    output_file = path
+
+    if cprofile_spans:
+        names = [name.strip() for name in cprofile_spans.split(",")]
+        _cprofile_all = "all" in names
+        _cprofile_spans.update(names)
+
+def enable_from_argv(argv):
+    """
+    Enables instrumentation if argv holds --profile or --profile=path.
+
+    Outputs:
+        argv without the --profile flag
+    """
+
+    remaining = []
+    for arg in argv:
+        if arg == "--profile":
+            enable(env_output() or default_output, os.environ.get("HOTSPOT_PROFILE_CPROFILE"))
+        elif arg.startswith("--profile="):
+            enable(arg.split("=", 1)[1], os.environ.get("HOTSPOT_PROFILE_CPROFILE"))
+        else:
+            remaining.append(arg)
+    return remaining
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null_span = _NullSpan()
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.profiler = None
+
+    def __enter__(self):
+        global _depth, _cprofile_active
+
+        _depth += 1
+
+        # fold the peak so far into the enclosing spans before resetting it for this one
+        peak = _max_rss_kb()
+        for parent in _open_spans:
+            parent.peak = max(parent.peak, peak)
+        self.resettable = _reset_peak()
+        self.start_rss = _rss_kb()
+        self.start_max_rss = _max_rss_kb()
+        self.peak = self.start_rss
+        _open_spans.append(self)
+
+        if not _cprofile_active and (_cprofile_all or self.name in _cprofile_spans):
+            self.profiler = cProfile.Profile()
+            _cprofile_active = True
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _depth, _cprofile_active
+
+        end = time.perf_counter()
+        _depth -= 1
+        _open_spans.pop()
+
+        end_rss = _rss_kb()
+        max_rss = _max_rss_kb()
+        if self.resettable or max_rss > self.start_max_rss:
+            self.peak = max(self.peak, max_rss)
+        else:
+            self.peak = max(self.peak, end_rss)
+        for parent in _open_spans:
+            parent.peak = max(parent.peak, self.peak)
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            _cprofile_active = False
+            _cprofile_count[self.name] += 1
+            self.profiler.dump_stats("%s.%s.%d.prof" % (output_file, self.name, _cprofile_count[self.name]))
+
+        args = dict(self.args)
+        args["rss_kb"] = end_rss
+        args["peak_rss_kb"] = self.peak
+        args["peak_growth_kb"] = self.peak - self.start_rss if self.start_rss >= 0 else -1
+        args["depth"] = _depth
+        _events.append({"name": self.name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                        "ts": (self.start - _start) * 1e6, "dur": (end - self.start) * 1e6, "args": args})
+        return False
+
+def span(name, **args):
+    """
+    Times a stage of the pipeline. Use as
+        with span("stage name"):
+            ...
+    Keyword arguments are stored with the span.
+    """
+
+    if not enabled:
+        return _null_span
+    return _Span(name, args)
+
+def traced(name=None):
+    """ Decorator running every call of a function in a span, named after the function by default. """
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, n=1):
+    """ Adds n to the counter name. """
+
+    if not enabled:
+        return
+    _counters[name] += n
+    _events.append({"name": name, "ph": "C", "pid": os.getpid(),
+                    "ts": (time.perf_counter() - _start) * 1e6, "args": {name: _counters[name]}})
+
+def frame(name):
+    """ Marks the end of a frame in the GUI loop name, adding the time since the last frame to its histogram. """
+
+    if not enabled:
+        return
+    now = time.perf_counter()
+    last = _last_frame.get(name)
+    _last_frame[name] = now
+    if last is None:
+        return
+
+    frame_ms = (now - last) * 1e3
+    hist = _histograms.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                         "buckets": [0] * len(frame_buckets_ms)})
+    hist["count"] += 1
+    hist["total_ms"] += frame_ms
+    hist["max_ms"] = max(hist["max_ms"], frame_ms)
+    for i, bound in enumerate(frame_buckets_ms):
+        if frame_ms <= bound:
+            hist["buckets"][i] += 1
+            break
+
+def summary():
+    """ Total time, call count, peak RSS and largest growth of RSS above its value at the start, per span name. """
+
+    stages = {}
+    for event in _events:
+        if event["ph"] != "X":
+            continue
+        stage = stages.setdefault(event["name"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                                  "peak_rss_kb": 0, "peak_growth_kb": 0})
+        stage["calls"] += 1
+        stage["total_ms"] += event["dur"] / 1e3
+        stage["max_ms"] = max(stage["max_ms"], event["dur"] / 1e3)
+        stage["peak_rss_kb"] = max(stage["peak_rss_kb"], event["args"]["peak_rss_kb"])
+        stage["peak_growth_kb"] = max(stage["peak_growth_kb"], event["args"]["peak_growth_kb"])
+    return stages
+
+def write(path=None):
+    """ Writes the recorded events, summary, counters and histograms. """
+
+    path = path or output_file
+    if not enabled or path is None:
+        return
+
+    histograms = {}
+    for name, hist in _histograms.items():
+        histograms[name] = dict(hist)
+        histograms[name]["mean_ms"] = hist["total_ms"] / hist["count"]
+        histograms[name]["bucket_bounds_ms"] = [str(b) for b in frame_buckets_ms]
+
+    with open(path, 'w') as f:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms", "summary": summary(),
+                   "counters": dict(_counters), "frame_histograms": histograms}, f)
+
+if env_output():
+    enable(env_output(), os.environ.get("HOTSPOT_PROFILE_CPROFILE"))
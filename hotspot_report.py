@@ -0,0 +1,76 @@
+"""
+Offline report of the most active routers or ports over a whole simulation.
+
+Ranks the top N routers (or ports) of every window offset for a window size with
+top_n_windows, and prints how many windows each one spends among the top N, with its
+average activity over the run. Activity is in flits per cycle. The full ranking can be
+written as a CSV with one window,rank,router,activity line per entry; for ports the router
+column holds the port slot.
+
+Takes either a trace file produced by garnet, which is parsed once and cached (see parse_cache),
+or a .pkl file dumped by parse_data.
+
+usage:
+python hotspot_report.py traceFile|pklFile [--window-size 1000] [--top 4] [--stride 1] [--ports]
+                                           [--csv ranking.csv] [--profile[=out.json]]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from parse_cache import load_trace
+from hotspot_functions import top_n_windows
+from hotspot_profiling import enable_from_argv
+
+def unit_names(net_topology, ports):
+    """ Printed name of each heat map column, the router id or router:direction for ports. """
+
+    if not ports:
+        return [str(r) for r in range(net_topology.num_routers)]
+    return ["%d:%s" % (r, d) for r, d in zip(net_topology.port_router, net_topology.port_names)]
+
+def report(filename, window_size, top, stride=1, ports=False, csv_file=None):
+    heat_map_routers, heat_map_ports, topology_info, _, net_topology = load_trace(filename)
+    heat_map = heat_map_ports if ports else heat_map_routers
+
+    window_size = min(window_size, heat_map.shape[0])
+    ranking, time_in_top_n = top_n_windows(heat_map, window_size, top, stride)
+    num_windows = len(ranking) // max(min(top, heat_map.shape[1]), 1)
+
+    print("%d cycles, %d windows of %d cycles, top %d %s" % (topology_info[0], num_windows, window_size, top,
+                                                            "ports" if ports else "routers"))
+
+    names = unit_names(net_topology, ports)
+    mean_activity = heat_map.mean(axis=0)
+    print("%-12s %12s %10s %12s" % ("port" if ports else "router", "windows", "fraction", "activity"))
+    for i in np.argsort(-time_in_top_n, kind='stable'):
+        if time_in_top_n[i] == 0:
+            break
+        print("%-12s %12d %10.3f %12.4f" % (names[i], time_in_top_n[i], time_in_top_n[i] / max(num_windows, 1),
+                                            mean_activity[i]))
+
+    if csv_file is not None:
+        np.savetxt(csv_file, np.column_stack([ranking[f] for f in ("window", "rank", "router")] + [ranking["activity"]]),
+                   fmt=["%d", "%d", "%d", "%.6f"], delimiter=',', header="window,rank,router,activity", comments='')
+        print("wrote ranking to %s" % csv_file)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="report the most active routers or ports over every window")
+    parser.add_argument("file", help="trace file or .pkl file dumped by parse_data")
+    parser.add_argument("--window-size", type=int, default=1000, help="cycles to average over")
+    parser.add_argument("--top", type=int, default=4, help="number of routers or ports ranked per window")
+    parser.add_argument("--stride", type=int, default=1, help="cycles between ranked windows")
+    parser.add_argument("--ports", action="store_true", help="rank ports instead of routers")
+    parser.add_argument("--csv", help="write the full ranking to this file")
+    args = parser.parse_args(argv)
+    if args.window_size < 1:
+        parser.error("--window-size should be 1 or more")
+    if args.stride < 1:
+        parser.error("--stride should be 1 or more")
+
+    report(args.file, args.window_size, args.top, args.stride, args.ports, args.csv)
+
+if __name__ == "__main__":
+    main(enable_from_argv(sys.argv)[1:])
@@ -0,0 +1,164 @@
+"""
+Runs a parameter sweep of garnet_synth_traffic.py simulations in parallel.
+
+Every combination of the swept options (synthetic traffic pattern, injection rate,
+routing algorithm and vcs per vnet) is launched as its own gem5 process on a local
+process pool. Each run gets an isolated output directory under the sweep directory,
+and gem5's output, the Loupe trace and the hotspot stat file are all written there.
+
+Runs are identified by a content hash of their parameters. A run directory that already
+holds a completion marker for the same hash is skipped, so an interrupted or extended
+sweep only launches the configurations that are missing.
+
+Options not swept (mesh size, sim cycles, ...) are passed through to gem5 after "--", e.g.
+
+python hotspot_sweep.py --synthetic uniform_random transpose --injectionrate 0.1 0.5 \\
+    --routing-algorithm 1 --vcs-per-vnet 4 16 -j 8 -- \\
+    --network=garnet2.0 --num-cpus=64 --num-dirs=64 --topology=Mesh --mesh-rows=8 --sim-cycles=10000
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+from multiprocessing import Pool
+
+# name of the marker written into a run directory once gem5 exits successfully
+done_marker = "done.json"
+
+def config_hash(config, extra_args):
+    """
+    Computes the content hash identifying a run.
+
+    Inputs:
+        config - dict of swept option names to values for this run
+        extra_args - list of options passed to gem5 unchanged
+    Outputs:
+        hex digest of the run parameters
+    """
+
+    key = json.dumps({"config": config, "extra_args": extra_args}, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def run_dir_name(config, run_hash):
+    """ Readable directory name for a run, suffixed with the start of its hash. """
+
+    name = "_".join(str(config[k]) for k in sorted(config))
+    return "%s_%s" % (name, run_hash[:10])
+
+def is_done(run_dir, run_hash):
+    """ Checks for a completion marker in run_dir written for the same parameters. """
+
+    try:
+        with open(os.path.join(run_dir, done_marker)) as f:
+            return json.load(f)["hash"] == run_hash
+    except (OSError, ValueError, KeyError):
+        return False
+
+def build_runs(args):
+    """
+    Expands the swept options into the list of runs.
+
+    Outputs:
+        list of (config, run_hash, run_dir) tuples, one per grid point
+    """
+
+    runs = []
+    for synthetic, injectionrate, routing, vcs in itertools.product(
+            args.synthetic, args.injectionrate, args.routing_algorithm, args.vcs_per_vnet):
+        config = {
+            "synthetic": synthetic,
+            "injectionrate": injectionrate,
+            "routing-algorithm": routing,
+            "vcs-per-vnet": vcs,
+        }
+        run_hash = config_hash(config, args.extra_args)
+        run_dir = os.path.join(args.sweep_dir, run_dir_name(config, run_hash))
+        runs.append((config, run_hash, run_dir))
+    return runs
+
+def gem5_command(gem5, gem5_config, config, run_dir, extra_args):
+    """ Builds the gem5 command line for a single run. """
+
+    cmd = [gem5, "--outdir=" + run_dir, gem5_config]
+    cmd += ["--%s=%s" % (k, v) for k, v in sorted(config.items())]
+    cmd += extra_args
+    cmd += ["--loupe-trace-file=" + os.path.join(run_dir, "LoupeTraceFile.csv"),
+            "--hotspot-stat-file=" + os.path.join(run_dir, "hotspotStatFile.txt")]
+    return cmd
+
+def run_one(job):
+    """
+    Runs one gem5 simulation in its own directory. Called from the process pool.
+
+    Inputs:
+        job - (cmd, config, run_hash, run_dir) tuple
+    Outputs:
+        (run_dir, gem5 return code)
+    """
+
+    cmd, config, run_hash, run_dir = job
+    os.makedirs(run_dir, exist_ok=True)
+
+    with open(os.path.join(run_dir, "run.log"), "w") as log:
+        log.write(" ".join(cmd) + "\n")
+        log.flush()
+        ret = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT)
+
+    if ret == 0:
+        with open(os.path.join(run_dir, done_marker), "w") as f:
+            json.dump({"hash": run_hash, "config": config, "cmd": cmd}, f, indent=1)
+    return run_dir, ret
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="parallel sweep of garnet_synth_traffic runs")
+    parser.add_argument("--gem5", default="./build/Garnet_standalone/gem5.opt",
+                        help="gem5 binary")
+    parser.add_argument("--config", default="configs/example/garnet_synth_traffic.py",
+                        help="gem5 config script")
+    parser.add_argument("--sweep-dir", default="sweep_output",
+                        help="directory holding one output directory per run")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of simulations to run at once")
+    parser.add_argument("--synthetic", nargs="+", default=["uniform_random"])
+    parser.add_argument("--injectionrate", nargs="+", type=float, default=[0.1])
+    parser.add_argument("--routing-algorithm", nargs="+", default=["0"])
+    parser.add_argument("--vcs-per-vnet", nargs="+", type=int, default=[4])
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the commands that would be run")
+    parser.add_argument("extra_args", nargs=argparse.REMAINDER,
+                        help="options after -- are passed to every gem5 run")
+    args = parser.parse_args(argv)
+    if args.extra_args[:1] == ["--"]:
+        args.extra_args = args.extra_args[1:]
+
+    jobs = []
+    skipped = 0
+    for config, run_hash, run_dir in build_runs(args):
+        if is_done(run_dir, run_hash):
+            skipped += 1
+            continue
+        cmd = gem5_command(args.gem5, args.config, config, run_dir, args.extra_args)
+        jobs.append((cmd, config, run_hash, run_dir))
+
+    print("%d runs to launch, %d already complete" % (len(jobs), skipped))
+    if args.dry_run:
+        for job in jobs:
+            print(" ".join(job[0]))
+        return 0
+
+    failed = 0
+    with Pool(max(1, args.jobs)) as pool:
+        for run_dir, ret in pool.imap_unordered(run_one, jobs):
+            if ret != 0:
+                failed += 1
+            print("%s: %s" % ("done" if ret == 0 else "FAILED (%d)" % ret, run_dir))
+
+    print("%d runs finished, %d failed" % (len(jobs) - failed, failed))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -3,7 +3,8 @@ Colormap visualization for mesh topology.
 
 Supports an arbitrary NxN mesh with any traffic pattern.
 
-Use parse_data to first parse a trace file produced by garnet and dump data into a .pkl file.
+Takes either a trace file produced by garnet, which is parsed once and cached (see parse_cache),
+or a .pkl file dumped by parse_data.
 The filename at the beginning of main can be changed to visualize a different sim.
 
 Hotspots are visualized by a color interpolation of router activity to colormap JET seen here
@@ -29,7 +30,9 @@ ECE 6115
 
 from hotspot_visualizer_mesh import create_heat_maps
 from parse_data import parseData, load
+from parse_cache import load_trace
 from hotspot_functions import create_colormap, trackbar_nothing
+from hotspot_profiling import span, frame, enable_from_argv
 
 import sys
 import cv2 as cv
@@ -41,8 +44,8 @@ def main(filename):
 
     window_size = 100
 
-    heat_map, _, _, _ = load(filename)
-    heat_map /= 4.0
+    heat_map, _, _, _, net_topology = load_trace(filename)
+    heat_map /= net_topology.max_ports
 
     sim_cycles = heat_map.shape[0]
     color_map = create_colormap(heat_map, window_size)
@@ -56,9 +59,11 @@ def main(filename):
     old_window_size = window_size
 
     while(1):
-        cv.imshow('Colormap', color_map)
+        with span("imshow"):
+            cv.imshow('Colormap', color_map)
         
         k = cv.waitKey(1) & 0xFF # wait for 1ms
+        frame("colormap")
         if k == 27: # hit escape to end the program
             break
         
@@ -74,7 +79,8 @@ def main(filename):
         old_window_size = window_size
 
 if __name__ == "__main__":
+    sys.argv = enable_from_argv(sys.argv)
     if(len(sys.argv) < 2):
-        print("usage: python hotspot_visualizer_colormap.py pklFile");
+        print("usage: python hotspot_visualizer_colormap.py traceFile|pklFile [--profile[=out.json]]");
     else:
         main(sys.argv[1])
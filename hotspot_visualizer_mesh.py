@@ -3,7 +3,8 @@ Hotspot visualizer for mesh topology.
 
 Supports an arbitrary NxN mesh with any traffic pattern.
 
-Use parse_data to first parse a trace file produced by garnet and dump data into a .pkl file.
+Takes either a trace file produced by garnet, which is parsed once and cached (see parse_cache),
+or a .pkl file dumped by parse_data.
 The filename at the beginning of main can be changed to visualize a different sim.
 
 Hotspots are visualized by a color interpolation of router activity to colormap JET seen here
@@ -17,7 +18,10 @@ Window size -> Changes the number of cycles to average router activity over when
                are more susceptible to noise.
 Window offset -> cycle offset of the chosen window size, this is like sliding the window over the sim
                  and is mathematically equivalent to a convolution.
-Most active router -> draws an X through the top N most active routers
+Most active router -> draws an X through the top N most active routers. Once the window size has
+                      settled, the top routers of every window offset are ranked (see top_n_windows),
+                      so sliding the window only looks them up. Until then, and for more than
+                      rank_max_routers routers, only the current window is ranked.
 Toggle router/Port view -> changes view between color coding entire routers, or individual ports
 
 Alan Kittel
@@ -26,91 +30,144 @@ ECE 6115
 """
 
 import sys
+import time
 import cv2 as cv
 import numpy as np
 from parse_data import parseData, load
+from parse_cache import load_trace
 
-from hotspot_functions import create_heat_maps, heat_map_window, trackbar_nothing
+from hotspot_functions import create_heat_maps, heat_map_window, top_n_windows, top_n_window, most_active_at, \
+    trackbar_nothing
+from hotspot_profiling import span, frame, traced, enable_from_argv
 
-num_ports = 4 # 2D mesh, 4 ports - excluding local port
+img_size = 1000 # the drawn image is about img_size x img_size pixels
 
-def draw_mesh(heat_map, topology_info, n, router_display):
-    """ Creates an image of a mesh network, with routers color coded.
+# ranking of the most active routers over all windows
+rank_settle_time = 0.5     # seconds the window size must stay unchanged before ranking all windows
+rank_max_routers = 16      # routers ranked per window
+rank_max_windows = 100000  # windows ranked, longer sims are ranked at a stride
+
+def outline_points(corners, start, end):
+    """ Points along a router outline from start to end, measured in sides from the first corner. """
+
+    def point(t):
+        side = min(int(t), 3)
+        return corners[side] + (corners[side+1] - corners[side])*(t - side)
+
+    return [point(start)] + [corners[i] for i in range(int(start)+1, int(np.ceil(end)))] + [point(end)]
+
+def render_geometry(net_topology, router_display):
+    """ Precomputes the parts of the drawing that do not change between frames.
+        Computed once per topology and view, and cached on the topology.
 
         Inputs:
-            heat_map - array of shape (sim_cycles//window_size, num_routers) representing the average arrival rate of
-                       flits at each router for each window. Normalized between 0 (no flits) and 1 (flits arrive at every port every cycle).
-            topology_info - list of topology information
+            net_topology - Topology of the network
+            router_display - 0 to color routers, 1 to color ports
         Outputs:
-            img - ~1000x1000 image with the drawn mesh topology, to be displayed in the openCV GUI
+            dict with
+            background - image with the links drawn
+            color_idx, color_label - flat pixel indices of the router outlines (router_display 0)
+                                     or port sides (router_display 1), and the router or port slot
+                                     each pixel is colored by
+            x_idx, x_label - flat pixel indices of the X through each router, and its router
     """
 
-    img_size = 1000 # set img size as 1000x1000
-    num_rows = topology_info[2]
-    router_width = img_size//2//num_rows # pixel width for a drawn router
-
-    img = np.full((img_size+router_width,img_size+router_width,3), 255, np.uint8)
-
-    if router_display == 0:
-        # apply JET colormap to heat map to assign colors to routers
-        intensities = np.flip(np.array(heat_map*255, dtype=np.uint8).reshape(num_rows,num_rows), axis=0).flatten()
-        colors = np.array(cv.applyColorMap(intensities, cv.COLORMAP_JET).reshape(num_rows,num_rows,3), dtype=float)
-        most_active = np.argsort(-intensities, kind='stable')[0:n]
-
-        for i in range(num_rows):
-            for j in range(num_rows):
-                # draw routers w/ interpolated color
-                top_left_x = router_width + router_width*i*2
-                top_left_y = router_width + router_width*j*2
-                cv.rectangle(img, (top_left_x, top_left_y), (top_left_x+router_width, top_left_y+router_width), tuple(colors[j][i][:]), 2)
-
-                # draw X through routers among the top n most active
-                if np.any(j*num_rows + i == most_active):
-                    cv.line(img, (top_left_x, top_left_y), (top_left_x+router_width, top_left_y+router_width), tuple(colors[j][i][:]), 2)
-                    cv.line(img, (top_left_x, top_left_y+router_width), (top_left_x+router_width, top_left_y), tuple(colors[j][i][:]), 2)
-    else: # router_display = 1
-        # assign color to each port
-        intensities = np.flip(np.array(heat_map*255, dtype=np.uint8).reshape(num_rows*num_rows,num_ports).reshape(num_rows,num_rows,num_ports), axis=0).flatten()
-        colors_ports = np.array(cv.applyColorMap(intensities, cv.COLORMAP_JET).reshape(num_rows,num_rows,num_ports,3), dtype=float)
-        router_intensities = np.array(np.sum(intensities.reshape(num_rows*num_rows, num_ports), axis=1).flatten()/num_ports, dtype=np.uint8)
-
-        # reformat condensed heat map into one for the routers
-        colors_routers = np.array(cv.applyColorMap(router_intensities, cv.COLORMAP_JET).reshape(num_rows,num_rows,3), dtype=float)
-
-        # most active routers
-        most_active = np.argsort(-router_intensities, kind='stable')[0:n]
-
-        for i in range(num_rows):
-            for j in range(num_rows):
-                top_left_x = router_width + router_width*i*2
-                top_left_y = router_width + router_width*j*2
-                for k in range(num_ports):
-                    # draw ports w/ interpolated color. For now each port is hardcoded, so it's a bit messy.
-                    if k == 0: # south port
-                        cv.line(img, (top_left_x, top_left_y), (top_left_x+router_width, top_left_y), tuple(colors_ports[j][i][k][:]), 2)
-                    elif k == 1: # east port
-                        cv.line(img, (top_left_x+router_width, top_left_y), (top_left_x+router_width, top_left_y+router_width), tuple(colors_ports[j][i][k][:]), 2)
-                    elif k == 2: # north port
-                        cv.line(img, (top_left_x+router_width, top_left_y+router_width), (top_left_x, top_left_y+router_width), tuple(colors_ports[j][i][k][:]), 2)
-                    else: # west port
-                        cv.line(img, (top_left_x, top_left_y+router_width), (top_left_x, top_left_y), tuple(colors_ports[j][i][k][:]), 2)
-
-                    # draw X through routers among the top n most active
-                    if np.any(j*num_rows + i == most_active):
-                        cv.line(img, (top_left_x, top_left_y), (top_left_x+router_width, top_left_y+router_width), tuple(colors_routers[j][i][:]), 2)
-                        cv.line(img, (top_left_x, top_left_y+router_width), (top_left_x+router_width, top_left_y), tuple(colors_routers[j][i][:]), 2)
-
-    # draw links as black lines
+    key = (router_display, img_size)
+    if key in net_topology._render_cache:
+        return net_topology._render_cache[key]
+
+    # grid size from the layout itself, which may have been saved with the parsed data
+    layout = net_topology.layout()
+    cols, rows = layout.max(axis=0) + 1 if len(layout) > 0 else (1, 1)
+    router_width = max(img_size//2//max(rows, cols), 1) # pixel width for a drawn router
+    half_width = router_width//2
+    top_left = router_width + router_width*2*layout
+    shape = (router_width*(2*rows+1), router_width*(2*cols+1))
+
+    # draw links as lines between router edges, black between grid neighbors and grey otherwise.
+    # grey links are drawn first so links between neighbors stay visible where they overlap
     # TODO add option to interpolate color for links as well
-    for i in range(num_rows):
-        for j in range(num_rows):
-            top_left_x = router_width + router_width*i*2
-            top_left_y = router_width + router_width*j*2
-
-            if j != num_rows - 1: # North-South links
-                cv.line(img, (top_left_x+router_width//2, top_left_y+router_width), (top_left_x+router_width//2, top_left_y+router_width*2), (0,0,0), 2)
-            if i != num_rows - 1: # East-West links
-                cv.line(img, (top_left_x+router_width, top_left_y+router_width//2), (top_left_x+router_width*2, top_left_y+router_width//2), (0,0,0), 2)
+    background = np.full(shape + (3,), 255, np.uint8)
+    links = net_topology.links()
+    neighbors = np.abs(top_left[links[:, 0]] - top_left[links[:, 1]]).sum(axis=1) == 2*router_width
+    for (src, dst), neighbor in sorted(zip(links, neighbors), key=lambda link: link[1]):
+        start, end = top_left[src] + half_width, top_left[dst] + half_width
+        if np.abs(end - start).max() == 0:
+            continue
+        step = (end - start) / np.abs(end - start).max()
+        color = (0,0,0) if neighbor else (160,160,160)
+        cv.line(background, tuple(np.round(start + step*half_width).astype(int)),
+                tuple(np.round(end - step*half_width).astype(int)), color, 2)
+
+    # label images, holding the router or port slot drawn at each pixel and -1 elsewhere
+    color_labels = np.full(shape, -1, np.float32)
+    x_labels = np.full(shape, -1, np.float32)
+    degree = net_topology.degree
+    for r in range(net_topology.num_routers):
+        x, y = top_left[r]
+        w = router_width
+        if router_display == 0:
+            cv.rectangle(color_labels, (x, y), (x+w, y+w), float(r), 2)
+        else:
+            # split the router outline clockwise from the top left corner into one side per port,
+            # for mesh routers this gives the North, East, South and West sides
+            corners = np.array([(x, y), (x+w, y), (x+w, y+w), (x, y+w), (x, y)])
+            d = degree[r]
+            for k in range(d):
+                points = outline_points(corners, 4*k/d, 4*(k+1)/d)
+                cv.polylines(color_labels, [np.round(points).astype(np.int32)], False,
+                             float(net_topology.indptr[r] + k), 2)
+        cv.line(x_labels, (x, y), (x+w, y+w), float(r), 2)
+        cv.line(x_labels, (x, y+w), (x+w, y), float(r), 2)
+
+    geometry = {"background": background}
+    for name, labels in (("color", color_labels), ("x", x_labels)):
+        labels = labels.ravel()
+        idx = np.nonzero(labels >= 0)[0]
+        geometry[name + "_idx"] = idx
+        geometry[name + "_label"] = labels[idx].astype(np.int64)
+
+    net_topology._render_cache[key] = geometry
+    return geometry
+
+@traced()
+def draw_mesh(heat_map, net_topology, most_active, router_display):
+    """ Creates an image of the network, with routers or ports color coded.
+        Routers are placed on the grid given by the topology layout, for meshes this is the mesh itself.
+
+        Inputs:
+            heat_map - average arrival rate of flits at each router (router_display 0) or port slot
+                       (router_display 1) over the window. Normalized between 0 (no flits) and 1
+                       (flits arrive at every port every cycle).
+            net_topology - Topology of the network
+            most_active - routers to draw an X through, e.g. from most_active_at
+            router_display - 0 to color routers, 1 to color ports
+        Outputs:
+            img - ~1000x1000 image with the drawn topology, to be displayed in the openCV GUI
+    """
+
+    geometry = render_geometry(net_topology, router_display)
+    img = geometry["background"].copy()
+    pixels = img.reshape(-1, 3)
+
+    # apply JET colormap to heat map to assign colors to routers or ports
+    intensities = np.array(heat_map*255, dtype=np.uint8)
+    colors = cv.applyColorMap(intensities, cv.COLORMAP_JET).reshape(-1, 3)
+    pixels[geometry["color_idx"]] = colors[geometry["color_label"]]
+
+    # draw X through the most active routers
+    if len(most_active) > 0:
+        if router_display == 0:
+            colors_routers = colors
+        else:
+            # reformat port intensities into ones for the routers
+            port_sum = np.bincount(net_topology.port_router, weights=intensities, minlength=net_topology.num_routers)
+            router_intensities = np.array(port_sum / np.maximum(net_topology.degree, 1), dtype=np.uint8)
+            colors_routers = cv.applyColorMap(router_intensities, cv.COLORMAP_JET).reshape(-1, 3)
+
+        selected = np.isin(geometry["x_label"], most_active)
+        pixels[geometry["x_idx"][selected]] = colors_routers[geometry["x_label"][selected]]
+
     return img
 
 def main(filename):
@@ -120,8 +177,8 @@ def main(filename):
     window_size = 1000
     window_offset = 1000
 
-    heat_map_routers, heat_map_ports, topology_info, _ = load(filename)
-    heat_map_routers /= 4.0
+    router_counts, heat_map_ports, topology_info, _, net_topology = load_trace(filename)
+    heat_map_routers = router_counts / net_topology.max_ports
 
     sim_cycles = topology_info[0]
 
@@ -134,7 +191,7 @@ def main(filename):
     cv.resizeWindow('Heatmap', 1000, 1000) # default size is 1000x1000px, but it is resizable
     cv.createTrackbar('Window Size', 'Heatmap', window_size, sim_cycles, trackbar_nothing)
     cv.createTrackbar('Window Offset', 'Heatmap', window_offset, sim_cycles-1, trackbar_nothing)
-    cv.createTrackbar('Most Active Routers', 'Heatmap', 0, topology_info[2]**2, trackbar_nothing)
+    cv.createTrackbar('Most Active Routers', 'Heatmap', 0, net_topology.num_routers, trackbar_nothing)
     cv.createTrackbar('Toggle Router/Port View', 'Heatmap', 0, 1, trackbar_nothing)
     cv.createTrackbar('Toggle normalize for average flits', 'Heatmap', 0, 1, trackbar_nothing)
 
@@ -145,16 +202,39 @@ def main(filename):
     router_display = cv.getTrackbarPos('Toggle Router/Port View','Heatmap')
     normalize_opt = cv.getTrackbarPos('Toggle normalize for average flits','Heatmap')
 
+    # ranking of the most active routers for every window offset, on the flit counts so ties
+    # are exact. Redone once the window size has settled after a change; windows are looked up
+    # at the closest ranked offset at or before them
+    ranking = None
+    ranked_size = 0
+    ranked_n = min(rank_max_routers, net_topology.num_routers)
+    rank_stride = max(1, -(-sim_cycles // rank_max_windows))
+    last_size_change = time.perf_counter()
+
     while(1):
         heat_map_routers_window = heat_map_window(heat_map_routers, window_size, window_offset, normalize_opt)
         heat_map_ports_window = heat_map_window(heat_map_ports, window_size, window_offset, normalize_opt)
+
+        top_routers = []
+        if most_active > 0:
+            if ranking is not None and ranked_size == window_size and most_active <= ranked_n:
+                top_routers = most_active_at(ranking, window_offset, most_active)
+            else:
+                top_routers = top_n_window(router_counts, window_size, window_offset, most_active)
+                if most_active <= ranked_n and time.perf_counter() - last_size_change > rank_settle_time:
+                    ranking, _ = top_n_windows(router_counts, window_size, ranked_n, rank_stride)
+                    ranked_size = window_size
+
         # draw the mesh, either with routers color coded, or the ports
         if router_display == 0:
-            cv.imshow('Heatmap', draw_mesh(heat_map_routers_window, topology_info, most_active, router_display))
+            img = draw_mesh(heat_map_routers_window, net_topology, top_routers, router_display)
         else:
-            cv.imshow('Heatmap', draw_mesh(heat_map_ports_window, topology_info, most_active, router_display))
+            img = draw_mesh(heat_map_ports_window, net_topology, top_routers, router_display)
+        with span("imshow"):
+            cv.imshow('Heatmap', img)
 
         k = cv.waitKey(1) & 0xFF # wait for 1ms
+        frame("mesh")
         if k == 27: # hit escape to end the program
             break
 
@@ -181,13 +261,17 @@ def main(filename):
             heat_map_routers_window = heat_map_window(heat_map_routers, window_size, window_offset, normalize_opt)
             heat_map_ports_window = heat_map_window(heat_map_ports, window_size, window_offset, normalize_opt)
 
+        if window_size != old_window_size:
+            last_size_change = time.perf_counter()
+
         old_window_size = window_size
         old_window_offset = window_offset
 
     cv.destroyAllWindows()
 
 if __name__ == "__main__":
+    sys.argv = enable_from_argv(sys.argv)
     if(len(sys.argv) < 2):
-        print("usage: python hotspot_visualizer_mesh.py pklFile");
+        print("usage: python hotspot_visualizer_mesh.py traceFile|pklFile [--profile[=out.json]]");
     else:
         main(sys.argv[1])
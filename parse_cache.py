@@ -0,0 +1,107 @@
+"""
+Cache of parsed traces, so the visualizers can be pointed directly at a trace file.
+
+A trace is identified by its size, modification time and hashes of a few sampled blocks,
+along with the parser version. On a cache miss the trace is parsed with parse_data and the
+result saved under that key. On a hit the saved .pkl is loaded, which is nearly instant.
+Least recently used entries are removed once the cache grows past its size limit.
+
+The cache directory is HOTSPOT_CACHE_DIR (default ~/.cache/garnet_hotspot), and its size
+limit HOTSPOT_CACHE_MAX_BYTES (default 2GB).
+"""
+
+import hashlib
+import os
+import sys
+
+from parse_data import load, load_and_save, parser_version
+
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "garnet_hotspot")
+default_max_bytes = 2 * 1024**3
+
+sample_blocks = 8 # number of blocks hashed besides the first and last
+sample_block_size = 64 * 1024
+
+def cache_dir():
+    return os.environ.get("HOTSPOT_CACHE_DIR", default_cache_dir)
+
+def cache_max_bytes():
+    return int(os.environ.get("HOTSPOT_CACHE_MAX_BYTES", default_max_bytes))
+
+def trace_key(filename):
+    """
+    Computes the cache key of a trace without reading all of it.
+
+    Inputs:
+        filename - the relative path to the trace
+    Outputs:
+        hex digest of the file size, mtime, sampled block contents and parser version
+    """
+
+    st = os.stat(filename)
+    h = hashlib.sha1()
+    h.update(("%d,%d,%d," % (st.st_size, st.st_mtime_ns, parser_version)).encode())
+
+    # first and last blocks, and evenly spaced blocks in between
+    last = max(st.st_size - sample_block_size, 0)
+    offsets = [0, last] + [last * (i + 1) // (sample_blocks + 1) for i in range(sample_blocks)]
+    with open(filename, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            h.update(f.read(sample_block_size))
+    return h.hexdigest()
+
+def evict(directory, max_bytes, keep=None):
+    """ Removes least recently used cache entries until the cache fits in max_bytes. """
+
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(".pkl"):
+            path = os.path.join(directory, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            os.remove(path)
+            total -= size
+
+def cached_parse(filename, topology="MESH"):
+    """
+    Returns the path of the parsed .pkl for a trace, parsing it only on a cache miss.
+    """
+
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, trace_key(filename) + ".pkl")
+
+    if os.path.exists(path):
+        os.utime(path) # mark as recently used
+        return path
+
+    print("parsing %s (not in cache)" % filename)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    load_and_save(filename, tmp_path, topology)
+    os.replace(tmp_path, path)
+    evict(directory, cache_max_bytes(), keep=path)
+    return path
+
+def load_trace(filename):
+    """
+    Loads parsed data from either a .pkl from parse_data or a trace file, using the cache for
+    trace files. Returns the same values as parse_data.load.
+    """
+
+    if filename.endswith(".pkl"):
+        return load(filename)
+    return load(cached_parse(filename))
+
+if __name__ == "__main__":
+    if(len(sys.argv) < 2):
+        print("usage: python parse_cache.py traceFile...")
+    else:
+        for trace in sys.argv[1:]:
+            print(cached_parse(trace))
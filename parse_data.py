@@ -7,11 +7,22 @@ Albert Cho
 Version 1.0: Initial implementation
 """
 
+import itertools
+import os
 import sys
 import numpy as np
 import pickle
 
 from hotspot_functions import create_heat_maps
+from trace_io import iter_trace_lines
+from topology import Topology
+from hotspot_profiling import span, count, traced, enable_from_argv
+
+# bump when the parsed output changes, so cached parses (see parse_cache) are redone
+parser_version = 4
+
+# trace lines read at a time, so reading and row conversion can be timed apart
+read_batch_lines = 65536
 
 # data type for the cycle data
 dtype = [
@@ -26,77 +37,120 @@ dtype = [
     ("flit_src", "i4"),
     ("flit_dst", "i4"),
     ("flit_enqueue", "i4"),
+    ("inport", "i4"), # input unit index for InUnit rows, -1 otherwise and in older traces
 ]
 
-def parseData(filename, topology):
+@traced()
+def parseData(filename, topology, cycle_range=None):
     """
     Parses the .csv file produced by running a Garnet simulation.
-    For now, only meshes are supported.
+    Router ports are read from the "Ports" lines of the trace header. Older traces without
+    them are assumed to be meshes.
 
     Inputs:
-        filename - the relative path to the .csv file
-        topology - string identifying the topology type, for only "mesh" is supported
+        filename - the relative path to the .csv file, plain or block compressed (see trace_io)
+        topology - string identifying the topology type, currently unused
+        cycle_range - optional (start, end) cycles, inclusive, to parse only part of the trace
     Outputs:
         cycle_data - cycle-by-cycle data for flit presence in buffers and on links
         total_router_activity - list of total flits passing through each router for whole simulation
-        topology_info - extracted topology information, varies by topology type
-                        For mesh, this is [num_routers, num_rows, vcs_per_vnet, m_virtual_networks]
+        topology_info - extracted topology information,
+                        [sim_cycles, num_routers, num_rows, vcs_per_vnet, m_virtual_networks, max_ports]
+                        (max_ports is missing in older traces)
+        net_topology - Topology with the router ports and layout
     """
 
-    # open trace file and read lines
-    traceFile = open(filename)
-    lines = traceFile.readlines()
-    lines = [line.split(',')[0:-1] for line in lines]
+    # stream the trace file line by line
+    lines = iter_trace_lines(filename, cycle_range)
 
     # get topology information
-    lines[0].pop(0)
-    topology_info = np.array([int(lines[0][i]) for i in range(len(lines[0]))])
-    
-
-    # line number of the end of sim printing
-    end_sim_idx = np.argwhere([line[0] == "End of sim" for line in lines])[0][0]
-
-    # parse the cycle data into a strucutred numpy array
-    cycle_data = lines[1:end_sim_idx]
-    for i in range(len(cycle_data)):
-        cycle_data[i] = (int(cycle_data[i][0]), cycle_data[i][1], int(cycle_data[i][2]), cycle_data[i][3], \
-            int(cycle_data[i][5]), int(cycle_data[i][6]), int(cycle_data[i][7]), int(cycle_data[i][8]), \
-            int(cycle_data[i][9]), int(cycle_data[i][10]), int(cycle_data[i][11]))
-    cycle_data = np.array(cycle_data, dtype=dtype)
+    header = next(lines).split(',')[0:-1]
+    header.pop(0)
+    topology_info = np.array([int(header[i]) for i in range(len(header))])
+
+    # parse the cycle data up to the end of sim printing into a strucutred numpy array
+    cycle_data = []
+    ports = {}
+    trailer = []
+    end_of_sim = False
+    with span("read_rows"):
+        while not end_of_sim:
+            with span("read_lines"):
+                batch = list(itertools.islice(lines, read_batch_lines))
+            if not batch:
+                break
+            with span("convert_rows"):
+                for k, line in enumerate(batch):
+                    line = line.split(',')
+                    if line[0] == "End of sim":
+                        trailer = batch[k+1:]
+                        end_of_sim = True
+                        break
+                    if line[0] == "Ports":
+                        # Ports,router,input unit,direction,upstream router,input unit,direction,...,
+                        ports[int(line[1])] = [(int(line[i]), line[i+1], int(line[i+2]))
+                                               for i in range(2, len(line) - 1, 3)]
+                        continue
+                    cycle = int(line[0])
+                    if cycle_range is not None and (cycle < cycle_range[0] or cycle > cycle_range[1]):
+                        continue
+                    cycle_data.append((cycle, line[1], int(line[2]), line[3], \
+                        int(line[5]), int(line[6]), int(line[7]), int(line[8]), \
+                        int(line[9]), int(line[10]), int(line[11]), \
+                        int(line[13]) if len(line) > 14 else -1))
+    with span("build_array"):
+        cycle_data = np.array(cycle_data, dtype=dtype)
+    count("trace_rows", len(cycle_data))
+    count("trace_bytes", os.path.getsize(filename))
 
     # parse the total router activity
-    end_sim = lines[end_sim_idx+2:]
+    end_sim = [line.split(',')[0:-1] for line in itertools.chain(trailer, lines)][1:]
     total_router_activity = np.array([int(router[1]) for router in end_sim])
+
+    if ports:
+        net_topology = Topology.from_ports(topology_info[1], topology_info[2], ports)
+    else:
+        net_topology = Topology.from_mesh(topology_info[1], topology_info[2])
+    net_topology.layout()
     
-    return cycle_data, total_router_activity, topology_info
+    return cycle_data, total_router_activity, topology_info, net_topology
 
+@traced()
 def load_and_save(loadfile, savefile, topology):
     save_data = {}
 
-    cycle_data, router_activity, topology_info = parseData(loadfile, topology)
+    cycle_data, router_activity, topology_info, net_topology = parseData(loadfile, topology)
 
-    heat_map_routers, heat_map_ports = create_heat_maps(cycle_data, topology_info)
+    heat_map_routers, heat_map_ports = create_heat_maps(cycle_data, net_topology)
 
     save_data["heat_map_routers"] = heat_map_routers
     save_data["heat_map_ports"] = heat_map_ports
     save_data["topology_info"] = topology_info
     save_data["router_activity"] = router_activity
+    save_data["net_topology"] = net_topology
 
-    with open(savefile, 'wb') as f:
+    with span("pickle_dump"), open(savefile, 'wb') as f:
         pickle.dump(save_data, f)
 
+@traced("pickle_load")
 def load(loadfile):
     with open(loadfile, 'rb') as f:
         data = pickle.load(f)
+
+    # .pkl files from before port information was traced hold a mesh
+    if "net_topology" not in data:
+        data["net_topology"] = Topology.from_mesh(data["topology_info"][1], data["topology_info"][2])
     
-    return data["heat_map_routers"], data["heat_map_ports"], data["topology_info"], data["router_activity"]
+    return data["heat_map_routers"], data["heat_map_ports"], data["topology_info"], data["router_activity"], \
+        data["net_topology"]
 
 def main(csvFile, outPklFile):
     load_and_save(csvFile, outPklFile, "MESH")
 
 
 if __name__ == "__main__":
+    sys.argv = enable_from_argv(sys.argv)
     if(len(sys.argv) < 3):
-        print("usage: python parse_data.py csvFile outPklFile");
+        print("usage: python parse_data.py csvFile outPklFile [--profile[=out.json]]");
     else:
         main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,197 @@
+"""
+Router topology read from a Garnet trace.
+
+The ports of each router are stored as a compact CSR adjacency structure: the ports of
+router r are the slots indptr[r] to indptr[r+1], where indices holds the router feeding
+each port (-1 if unconnected), port_ids the index of its Garnet input unit (-1 if
+unconnected or unknown) and port_names its Garnet direction name. Heat maps of port
+activity have one column per slot, in the same order.
+
+Routers whose ports have distinct mesh direction names (as in Mesh and Torus topologies)
+get the four slots North, East, South, West, so boundary routers keep unconnected slots.
+Other routers, such as those of a flattened butterfly with several East ports or of
+topologies with unnamed ports, get one slot per input port in input unit order.
+
+Routers are drawn on a grid, row by row from the bottom left as in Garnet's mesh
+numbering, using num_rows when the topology has one and the grid is not too elongated. The layout is computed once and
+kept in the object, so it is saved with the parsed data.
+"""
+
+import numpy as np
+
+mesh_directions = ["North", "East", "South", "West"]
+
+# meshes more elongated than this, e.g. 2 rows of 600 routers, are drawn on a square grid instead
+max_grid_aspect = 8
+
+class Topology:
+    def __init__(self, num_routers, num_rows, indptr, indices, port_names, port_ids=None):
+        """
+        Inputs:
+            num_routers - number of routers
+            num_rows - rows of a 2D topology, 0 or less if it has none
+            indptr - (num_routers+1) offsets of each router's port slots
+            indices - router feeding each port slot, -1 if unconnected
+            port_names - direction name of each port slot
+            port_ids - input unit index of each port slot, -1 if unconnected or unknown
+        """
+
+        self.num_routers = int(num_routers)
+        self.num_rows = int(num_rows)
+        self.indptr = np.asarray(indptr, dtype=np.int32)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.port_names = np.asarray(port_names, dtype=str)
+        if port_ids is None:
+            port_ids = np.full(len(self.indices), -1)
+        self.port_ids = np.asarray(port_ids, dtype=np.int32)
+        self._layout = None
+        self._render_cache = {}
+
+    def __getstate__(self):
+        # rendering geometry depends on the image size, recreate it after loading
+        state = dict(self.__dict__)
+        state["_render_cache"] = {}
+        return state
+
+    @property
+    def num_ports(self):
+        """ Total number of port slots. """
+        return len(self.indices)
+
+    @property
+    def degree(self):
+        """ Number of port slots of each router. """
+        return np.diff(self.indptr)
+
+    @property
+    def max_ports(self):
+        """ Largest number of port slots of any router, the most flits a router can receive per cycle. """
+        return int(self.degree.max()) if self.num_routers > 0 else 0
+
+    @property
+    def port_router(self):
+        """ Router owning each port slot. """
+        return np.repeat(np.arange(self.num_routers, dtype=np.int32), self.degree)
+
+    def port_slots(self, router_ids, inports):
+        """
+        Port slot of each (router, input unit index) pair.
+
+        Inputs:
+            router_ids - array of router ids
+            inports - array of input unit indices, same length as router_ids
+        Outputs:
+            array of port slots, -1 where the input unit is not a router to router port
+        """
+
+        known = self.port_ids >= 0
+        width = max(int(self.port_ids.max(initial=-1)), int(np.max(inports, initial=-1))) + 1
+        table = np.full((self.num_routers, width), -1, dtype=np.int64)
+        table[self.port_router[known], self.port_ids[known]] = np.nonzero(known)[0]
+        return table[router_ids, inports]
+
+    def direction_slots(self, router_ids, directions):
+        """
+        Port slot of each (router, inport direction) pair, for traces without input unit indices.
+        Where a router has several ports with the same direction name the first is used.
+
+        Inputs:
+            router_ids - array of router ids
+            directions - array of direction names, same length as router_ids
+        Outputs:
+            array of port slots, -1 where the router has no port in that direction
+        """
+
+        names, dir_codes = np.unique(directions, return_inverse=True)
+        known = np.isin(self.port_names, names)
+
+        # first slot of each (router, name), as slots are in router order
+        slots = np.nonzero(known)[0]
+        keys = self.port_router[slots].astype(np.int64) * len(names) + np.searchsorted(names, self.port_names[slots])
+        keys, first = np.unique(keys, return_index=True)
+
+        table = np.full(self.num_routers * len(names), -1, dtype=np.int64)
+        table[keys] = slots[first]
+        return table.reshape(self.num_routers, len(names))[router_ids, dir_codes]
+
+    def links(self):
+        """
+        Router to router links, each connected pair once.
+
+        Outputs:
+            (num_links, 2) array of router ids
+        """
+
+        connected = self.indices >= 0
+        pairs = np.stack((self.indices[connected], self.port_router[connected]), axis=1)
+        return np.unique(np.sort(pairs, axis=1), axis=0)
+
+    def grid_shape(self):
+        """ (rows, cols) of the grid the routers are drawn on. """
+
+        if self.num_rows > 0 and self.num_routers % self.num_rows == 0:
+            rows, cols = self.num_rows, self.num_routers // self.num_rows
+            if max(rows, cols) <= max_grid_aspect * min(rows, cols):
+                return rows, cols
+        cols = int(np.ceil(np.sqrt(self.num_routers)))
+        return int(np.ceil(self.num_routers / cols)), cols
+
+    def layout(self):
+        """
+        Grid position of each router, computed once.
+
+        Outputs:
+            (num_routers, 2) array of (column, row from the top)
+        """
+
+        if self._layout is None:
+            rows, cols = self.grid_shape()
+            ids = np.arange(self.num_routers)
+            self._layout = np.stack((ids % cols, rows - 1 - ids // cols), axis=1).astype(np.int32)
+        return self._layout
+
+    @classmethod
+    def from_mesh(cls, num_routers, num_rows):
+        """ Mesh topology with North, East, South, West slots, for traces without port information. """
+
+        cols = num_routers // num_rows
+        ids = np.arange(num_routers)
+        row, col = ids // cols, ids % cols
+        neighbors = np.stack((np.where(row < num_rows - 1, ids + cols, -1),
+                              np.where(col < cols - 1, ids + 1, -1),
+                              np.where(row > 0, ids - cols, -1),
+                              np.where(col > 0, ids - 1, -1)), axis=1)
+        return cls(num_routers, num_rows, np.arange(num_routers + 1) * 4, neighbors.flatten(),
+                   np.tile(mesh_directions, num_routers))
+
+    @classmethod
+    def from_ports(cls, num_routers, num_rows, ports):
+        """
+        Topology from the port lines of a trace.
+
+        Inputs:
+            num_routers - number of routers
+            num_rows - rows of a 2D topology, 0 or less if it has none
+            ports - dict of router id to list of (input unit index, direction, upstream router)
+                    for its router to router input ports
+        """
+
+        indptr = [0]
+        indices = []
+        port_names = []
+        port_ids = []
+        for router in range(num_routers):
+            router_ports = sorted(ports.get(router, []))
+            directions = [direction for _, direction, _ in router_ports]
+            if all(direction in mesh_directions for direction in directions) and \
+                    len(set(directions)) == len(directions):
+                by_direction = {direction: (port, src) for port, direction, src in router_ports}
+                port_names += mesh_directions
+                port_ids += [by_direction.get(direction, (-1, -1))[0] for direction in mesh_directions]
+                indices += [by_direction.get(direction, (-1, -1))[1] for direction in mesh_directions]
+            else:
+                port_names += directions
+                port_ids += [port for port, _, _ in router_ports]
+                indices += [src for _, _, src in router_ports]
+            indptr.append(len(indices))
+        return cls(num_routers, num_rows, indptr, indices, port_names, port_ids)
@@ -0,0 +1,205 @@
+"""
+Reading and writing of plain and block compressed Loupe trace files.
+
+A compressed trace is a sequence of gzip members, each holding a block of whole lines of
+the plain .csv trace. It is written by Garnet when run with --trace-compress, or by
+compress_trace below for an existing plain trace. Any gzip reader can decompress it.
+
+Next to the trace, "<trace>.idx" lists one block per line as
+offset,compressed_bytes,raw_bytes,first_cycle,last_cycle
+so a cycle range can be read by decompressing only the blocks that overlap it. The header
+(with the router port lines) and the end of sim trailer are kept in blocks of their own,
+indexed with cycles -1.
+
+usage:
+python trace_io.py compress csvFile [outFile]
+python trace_io.py report csvFile [start_cycle end_cycle]
+"""
+
+import gzip
+import itertools
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+gzip_magic = b"\x1f\x8b"
+
+# data type for the block index
+index_dtype = [
+    ("offset", "i8"),
+    ("compressed_bytes", "i8"),
+    ("raw_bytes", "i8"),
+    ("first_cycle", "i8"),
+    ("last_cycle", "i8"),
+]
+
+def is_compressed(filename):
+    """ True if filename is a gzip (block compressed) trace. """
+
+    with open(filename, 'rb') as f:
+        return f.read(2) == gzip_magic
+
+def index_filename(filename):
+    return filename + ".idx"
+
+def read_index(filename):
+    """
+    Reads the block index of a compressed trace.
+
+    Inputs:
+        filename - the compressed trace, not the index file
+    Outputs:
+        structured array with index_dtype fields, one entry per block,
+        or None if there is no index
+    """
+
+    idx_file = index_filename(filename)
+    if not os.path.exists(idx_file):
+        return None
+    index = np.loadtxt(idx_file, delimiter=',', skiprows=1, dtype=np.int64, ndmin=2)
+    return np.array([tuple(row) for row in index], dtype=index_dtype)
+
+def open_trace(filename):
+    """ Opens a plain or compressed trace as a text stream, decompressing in blocks as it is read. """
+
+    if is_compressed(filename):
+        return gzip.open(filename, 'rt')
+    return open(filename)
+
+def iter_trace_lines(filename, cycle_range=None):
+    """
+    Yields the lines of a plain or compressed trace.
+
+    Inputs:
+        filename - the relative path to the trace
+        cycle_range - optional (start, end) cycles, inclusive. With a compressed trace and
+                      its index, only the header, trailer and blocks overlapping the range
+                      are decompressed. Rows outside the range may still be yielded, the
+                      caller is expected to filter them.
+    """
+
+    index = read_index(filename) if cycle_range is not None and is_compressed(filename) else None
+
+    if index is None:
+        with open_trace(filename) as f:
+            for line in f:
+                yield line
+        return
+
+    start, end = cycle_range
+    no_cycles = index["first_cycle"] < 0
+    overlaps = np.logical_and(index["last_cycle"] >= start, index["first_cycle"] <= end)
+    keep = np.logical_or(no_cycles, overlaps)
+    keep[0] = keep[-1] = True
+
+    with open(filename, 'rb') as f:
+        for block in index[keep]:
+            f.seek(block["offset"])
+            data = zlib.decompress(f.read(block["compressed_bytes"]), 16 + zlib.MAX_WBITS)
+            for line in data.decode().splitlines(keepends=True):
+                yield line
+
+def compress_trace(filename, outfile=None, block_size=1<<20, level=6):
+    """
+    Writes a plain trace as a block compressed trace with its index, in the same layout
+    Garnet produces with --trace-compress.
+
+    Inputs:
+        filename - plain .csv trace
+        outfile - output path, filename + ".gz" by default
+        block_size - uncompressed bytes per block
+        level - zlib compression level
+    Outputs:
+        path of the compressed trace
+    """
+
+    if outfile is None:
+        outfile = filename + ".gz"
+
+    with open(filename, 'rb') as src, open(outfile, 'wb') as dst, \
+            open(index_filename(outfile), 'w') as idx:
+        idx.write("offset,compressed_bytes,raw_bytes,first_cycle,last_cycle\n")
+        offset = 0
+
+        def write_block(lines, first_cycle, last_cycle):
+            nonlocal offset
+            if not lines:
+                return
+            raw = b"".join(lines)
+            comp = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            data = comp.compress(raw) + comp.flush()
+            dst.write(data)
+            idx.write("%d,%d,%d,%d,%d\n" % (offset, len(data), len(raw), first_cycle, last_cycle))
+            offset += len(data)
+
+        # header and router port lines in a block of their own
+        header = [src.readline()]
+        line = src.readline()
+        while line.startswith(b"Ports,"):
+            header.append(line)
+            line = src.readline()
+        write_block(header, -1, -1)
+
+        lines = []
+        size = 0
+        first_cycle = last_cycle = -1
+        for line in itertools.chain([line], src):
+            if not line:
+                break
+            if line.startswith(b"End of sim"):
+                write_block(lines, first_cycle, last_cycle)
+                write_block([line] + src.readlines(), -1, -1)
+                lines = []
+                break
+            cycle = int(line[:line.index(b",")])
+            if not lines:
+                first_cycle = cycle
+            last_cycle = cycle
+            lines.append(line)
+            size += len(line)
+            if size >= block_size:
+                write_block(lines, first_cycle, last_cycle)
+                lines = []
+                size = 0
+        write_block(lines, first_cycle, last_cycle)
+
+    return outfile
+
+def report(filename, cycle_range=None):
+    """
+    Compresses a plain trace and prints the compression ratio and the parse time of the
+    plain and compressed versions.
+    """
+
+    from parse_data import parseData
+
+    start = time.perf_counter()
+    gz_file = compress_trace(filename)
+    compress_time = time.perf_counter() - start
+
+    plain_size = os.path.getsize(filename)
+    gz_size = os.path.getsize(gz_file)
+    print("plain size:        %d bytes" % plain_size)
+    print("compressed size:   %d bytes (+ %d bytes index)" % (gz_size, os.path.getsize(index_filename(gz_file))))
+    print("compression ratio: %.2f" % (plain_size / gz_size))
+    print("compress time:     %.3f s" % compress_time)
+
+    runs = [("plain", filename, None), ("compressed", gz_file, None)]
+    if cycle_range is not None:
+        runs += [("plain, range", filename, cycle_range), ("compressed, range", gz_file, cycle_range)]
+    for name, trace, trace_range in runs:
+        start = time.perf_counter()
+        cycle_data, _, _, _ = parseData(trace, "MESH", trace_range)
+        print("parse %-18s %.3f s, %d rows" % (name + ":", time.perf_counter() - start, len(cycle_data)))
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "compress":
+        print(compress_trace(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None))
+    elif len(sys.argv) in (3, 5) and sys.argv[1] == "report":
+        report(sys.argv[2], (int(sys.argv[3]), int(sys.argv[4])) if len(sys.argv) == 5 else None)
+    else:
+        print("usage: python trace_io.py compress csvFile [outFile]\n"
+              "       python trace_io.py report csvFile [start_cycle end_cycle]")